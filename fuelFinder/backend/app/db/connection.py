@@ -1,14 +1,171 @@
 import psycopg2
+import psycopg2.extensions
+import itertools
+import logging
 import os
+import threading
+import time
+from contextvars import ContextVar
 from dotenv import load_dotenv
+from app.metrics import CONNECT_LATENCY, observe_query
 
 load_dotenv()  # Load variables from .env
 
+logger = logging.getLogger(__name__)
+
+# Comma separated libpq DSNs of read replicas, e.g.
+# "host=replica1 port=5432 dbname=fuel user=app password=...,host=replica2 ..."
+# Leave unset to send everything to the primary.
+REPLICA_DSNS = [
+    dsn.strip() for dsn in os.getenv("POSTGRES_REPLICA_DSNS", "").split(",") if dsn.strip()
+]
+# After a caller writes, their reads stay on the primary this long so they
+# see their own change even if the replicas lag behind.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+# Response header telling the client until when (unix time) its reads should
+# go to the primary. Clients echo it back, so any worker or instance can
+# honour a write another one took.
+READ_YOUR_WRITES_HEADER = "x-read-your-writes-until"
+
+_replica_cycle = itertools.cycle(REPLICA_DSNS) if REPLICA_DSNS else None
+_replica_lock = threading.Lock()
+_recent_writes = {}  # sticky key -> time the primary-only window ends (this worker)
+# per request: {"read_primary_until": from the request, "wrote_until": for the response}
+_request_writes = ContextVar("request_writes", default=None)
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """
+    Cursor that records how long each statement takes and how many rows it
+    touched.
+    """
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            observe_query(query, time.perf_counter() - start, self.rowcount)
+
+
 def get_db_connection():
-    return psycopg2.connect(
+    start = time.perf_counter()
+    conn = psycopg2.connect(
         host=os.getenv("POSTGRES_HOST"),
         port=os.getenv("POSTGRES_PORT"),
         database=os.getenv("POSTGRES_DB"),
         user=os.getenv("POSTGRES_USER"),
-        password=os.getenv("POSTGRES_PASSWORD")
-    )
\ No newline at end of file
+        password=os.getenv("POSTGRES_PASSWORD"),
+        cursor_factory=TimedCursor,
+    )
+    CONNECT_LATENCY.observe(time.perf_counter() - start)
+    return conn
+
+
+def mark_write(sticky_key: str):
+    """
+    Record that `sticky_key` (e.g. "user:42") just wrote to the primary.
+    Within a request, this also sends READ_YOUR_WRITES_HEADER back.
+    """
+    state = _request_writes.get()
+    if state is not None:
+        state["wrote_until"] = time.time() + READ_YOUR_WRITES_SECONDS
+    now = time.monotonic()
+    _recent_writes[sticky_key] = now + READ_YOUR_WRITES_SECONDS
+    if len(_recent_writes) > 10_000:
+        # forget callers whose window has already ended
+        for key, until in list(_recent_writes.items()):
+            if until < now:
+                _recent_writes.pop(key, None)
+
+
+def request_recently_wrote() -> bool:
+    """
+    True when the current request carries a read-your-writes window that
+    has not ended yet.
+    """
+    state = _request_writes.get()
+    return state is not None and state["read_primary_until"] > time.time()
+
+
+def has_recent_writes() -> bool:
+    # cheap pre-check for callers whose sticky key is expensive to work out
+    return bool(_recent_writes) or request_recently_wrote()
+
+
+def recently_wrote(sticky_key) -> bool:
+    if request_recently_wrote():
+        return True
+    if sticky_key is None:
+        return False
+    until = _recent_writes.get(sticky_key)
+    if until is None:
+        return False
+    if until < time.monotonic():
+        _recent_writes.pop(sticky_key, None)
+        return False
+    return True
+
+
+def get_read_connection(sticky_key=None):
+    """
+    Connection for read-only handlers. Goes to a replica (round robin) unless
+    none are configured, the caller wrote recently, or the replica is down,
+    in which case the primary is used.
+    """
+    if _replica_cycle is None or recently_wrote(sticky_key):
+        return get_db_connection()
+
+    with _replica_lock:
+        dsn = next(_replica_cycle)
+    start = time.perf_counter()
+    try:
+        conn = psycopg2.connect(dsn, cursor_factory=TimedCursor)
+    except psycopg2.OperationalError as e:
+        logger.warning("Replica unavailable, reading from primary: %s", e)
+        return get_db_connection()
+    CONNECT_LATENCY.observe(time.perf_counter() - start)
+    conn.set_session(readonly=True)
+    return conn
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware carrying read-your-writes across workers: it reads the
+    client's READ_YOUR_WRITES_HEADER into the request, and sets it on the
+    response when the handler called mark_write().
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        until = 0.0
+        for name, value in scope["headers"]:
+            if name.decode("latin-1") == READ_YOUR_WRITES_HEADER:
+                try:
+                    # never longer than a real write would have asked for
+                    until = min(float(value), time.time() + READ_YOUR_WRITES_SECONDS)
+                except ValueError:
+                    pass
+        state = {"read_primary_until": until, "wrote_until": None}
+        token = _request_writes.set(state)
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start" and state["wrote_until"]:
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (READ_YOUR_WRITES_HEADER.encode(), f"{state['wrote_until']:.3f}".encode())
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            _request_writes.reset(token)
@@ -0,0 +1,10 @@
+-- migrate: no-transaction
+-- Built CONCURRENTLY so live tables keep taking writes while the index builds.
+
+-- latest price / price history per station (ORDER BY recorded_at DESC)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS prices_station_id_recorded_at_idx
+  ON prices (station_id, recorded_at DESC);
+
+-- favorites by station (the primary key only covers lookups by user_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS favorites_station_id_idx
+  ON favorites (station_id);
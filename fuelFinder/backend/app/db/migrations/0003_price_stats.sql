@@ -0,0 +1,41 @@
+-- Running price statistics used to catch bad submissions in add_price.
+-- scope is 'station:<id>' or 'area:<lat cell>:<lon cell>' (0.1 degree cells).
+CREATE TABLE
+  IF NOT EXISTS price_stats (
+    scope TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    mean DOUBLE PRECISION NOT NULL,
+    variance DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+  );
+
+-- Submissions held back as outliers; they never reach prices.
+CREATE TABLE
+  IF NOT EXISTS price_quarantine (
+    id SERIAL PRIMARY KEY,
+    station_id INTEGER NOT NULL REFERENCES stations (id) ON DELETE CASCADE,
+    price NUMERIC(10, 2) NOT NULL,
+    z_score DOUBLE PRECISION,
+    reason TEXT NOT NULL,
+    -- caller_key() of the submitter, so confirmations come from other people
+    submitted_by TEXT NOT NULL,
+    submitted_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+  );
+
+-- One-time backfill from existing history so checks work from day one.
+INSERT INTO price_stats (scope, n, mean, variance)
+SELECT 'station:' || station_id, COUNT(*), AVG(price), COALESCE(VAR_POP(price), 0)
+FROM prices
+GROUP BY station_id
+ON CONFLICT (scope) DO NOTHING;
+
+INSERT INTO price_stats (scope, n, mean, variance)
+SELECT
+  'area:' || FLOOR(s.latitude / 0.1)::INTEGER || ':' || FLOOR(s.longitude / 0.1)::INTEGER,
+  COUNT(*),
+  AVG(p.price),
+  COALESCE(VAR_POP(p.price), 0)
+FROM prices p
+JOIN stations s ON s.id = p.station_id
+GROUP BY 1
+ON CONFLICT (scope) DO NOTHING;
@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- add_price counts recent held submissions for a station to decide whether a
+-- quarantined price has been confirmed by others.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS price_quarantine_station_id_submitted_at_idx
+  ON price_quarantine (station_id, submitted_at);
@@ -0,0 +1,78 @@
+"""
+SQL for the hot read paths, kept free of app imports so `init_db.py check`
+can EXPLAIN exactly what the routes run without loading the routes.
+"""
+
+LIST_FAVORITES_SQL = """
+    -- name: list_favorites
+    SELECT
+      s.id,
+      s.name,
+      s.latitude,
+      s.longitude,
+      (
+        SELECT price
+        FROM prices
+        WHERE station_id = s.id
+        ORDER BY recorded_at DESC
+        LIMIT 1
+      ) AS latest_price,
+      (
+        SELECT recorded_at
+        FROM prices
+        WHERE station_id = s.id
+        ORDER BY recorded_at DESC
+        LIMIT 1
+      ) AS recorded_at,
+      COALESCE(
+        (
+          SELECT JSON_AGG(
+                   JSON_BUILD_OBJECT(
+                     'price',       p.price,
+                     'recorded_at', p.recorded_at
+                   )
+                   ORDER BY p.recorded_at DESC
+                 )
+          FROM prices p
+          WHERE p.station_id = s.id
+        ),
+        '[]'::json
+      ) AS prices
+    FROM stations s
+    JOIN favorites f
+      ON f.station_id = s.id
+    WHERE f.user_id = %s
+    ORDER BY s.id;
+"""
+
+NEW_STATIONS_SQL = """
+    -- name: snapshot_new_stations
+    SELECT id, name, latitude, longitude
+    FROM stations
+    WHERE id > %s
+    ORDER BY id
+"""
+
+NEW_PRICES_SQL = """
+    -- name: snapshot_new_prices
+    SELECT id, station_id, price, recorded_at
+    FROM prices
+    WHERE id > %s
+    ORDER BY id
+"""
+
+SELECT_STATS = """
+    -- name: price_stats_lookup
+    SELECT scope, n, mean, variance FROM price_stats WHERE scope = ANY(%s)
+"""
+
+MATCHING_QUARANTINED = """
+    -- name: price_quarantine_matches
+    SELECT COUNT(DISTINCT submitted_by)
+    FROM price_quarantine
+    WHERE station_id = %(station_id)s
+      AND submitted_by <> %(submitted_by)s
+      AND z_score IS NOT NULL
+      AND submitted_at >= CURRENT_TIMESTAMP - %(hours)s * INTERVAL '1 hour'
+      AND ABS(price - %(price)s) <= %(tolerance)s * %(price)s
+"""
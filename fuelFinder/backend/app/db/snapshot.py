@@ -0,0 +1,211 @@
+import math
+import os
+import threading
+import time
+from array import array
+from typing import List, NamedTuple
+
+from app.db.connection import get_db_connection, get_read_connection
+from app.db.queries import NEW_PRICES_SQL, NEW_STATIONS_SQL
+
+# How stale (in seconds) a read may be before it triggers an incremental refresh.
+SNAPSHOT_MAX_AGE = float(os.getenv("STATION_SNAPSHOT_MAX_AGE", "5"))
+
+# SERIAL ids are handed out at insert time but rows become visible at commit
+# time, so a slow transaction can commit an id lower than one we have already
+# seen. Re-reading a small window behind the cursor picks those rows up.
+CURSOR_OVERLAP = 100
+# A lookup of an unknown station id refreshes at most this often, so bad ids
+# can't turn every 404 into a round trip to Postgres.
+MISS_REFRESH_SECONDS = 1.0
+
+
+class StationColumns(NamedTuple):
+    """
+    Read-only copy of the station columns, one entry per station.
+    """
+
+    ids: array
+    names: List[str]
+    latitudes: array
+    longitudes: array
+    latest_prices: array  # NaN when a station has no price yet
+
+
+class StationSnapshot:
+    """
+    In-memory copy of the station catalog with each station's price history.
+
+    Station columns are kept as parallel arrays indexed by row number, so the
+    route planner can scan coordinates and latest prices without building a
+    dict per station. The snapshot is filled on the first read, not at
+    startup, so the app can boot while Postgres is slow or down. It is then
+    kept up to date by reading only the stations and prices rows added since
+    the last refresh.
+    """
+
+    def __init__(self, max_age: float = SNAPSHOT_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # one refresh at a time, so results are applied in the order read
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = None
+
+        self.ids = array("q")
+        self.names = []
+        self.latitudes = array("d")
+        self.longitudes = array("d")
+        self.latest_prices = array("d")  # NaN when a station has no price yet
+        self.latest_recorded_at = []
+        self.history = []  # per row: list of {"price", "recorded_at"}, newest first
+
+        self._rows_by_id = {}
+        self._seen_price_ids = set()  # only ids inside the overlap window
+        self._station_cursor = 0
+        self._price_cursor = 0
+        # bumped whenever the station columns change, to reuse columns() copies
+        self._version = 0
+        self._columns = None
+        self._columns_version = -1
+
+    # ----- loading -----
+
+    def refresh(self, use_primary: bool = False):
+        """
+        Pull in stations and prices added since the last refresh. Reads come
+        from a replica unless use_primary is set, which callers do right
+        after their own write so the snapshot is sure to include it.
+        """
+        with self._refresh_lock:
+            self._fetch_and_apply(use_primary)
+
+    def _fetch_and_apply(self, use_primary: bool = False):
+        conn = get_db_connection() if use_primary else get_read_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute(NEW_STATIONS_SQL, (self._station_cursor - CURSOR_OVERLAP,))
+            new_stations = cur.fetchall()
+            cur.execute(NEW_PRICES_SQL, (self._price_cursor - CURSOR_OVERLAP,))
+            new_prices = cur.fetchall()
+        finally:
+            cur.close()
+            conn.close()
+        self._apply(new_stations, new_prices)
+
+    def _apply(self, new_stations, new_prices):
+        with self._lock:
+            for station_id, name, lat, lon in new_stations:
+                if station_id not in self._rows_by_id:
+                    self._add_station(station_id, name, lat, lon)
+                    self._version += 1
+                self._station_cursor = max(self._station_cursor, station_id)
+
+            touched = set()
+            # ids at or below the window were handled by an earlier refresh
+            # and are no longer in _seen_price_ids; skip them so a result
+            # read before the latest one can't add them twice
+            floor = self._price_cursor - CURSOR_OVERLAP
+            for price_id, station_id, price, recorded_at in new_prices:
+                if price_id <= floor or price_id in self._seen_price_ids:
+                    continue
+                self._price_cursor = max(self._price_cursor, price_id)
+                row = self._rows_by_id.get(station_id)
+                if row is None:
+                    # station committed after our station query; the next
+                    # refresh re-reads this price through the overlap window
+                    continue
+                self._seen_price_ids.add(price_id)
+                self.history[row].append(
+                    {"price": float(price), "recorded_at": recorded_at}
+                )
+                touched.add(row)
+
+            for row in touched:
+                self.history[row].sort(key=lambda p: p["recorded_at"], reverse=True)
+                self.latest_prices[row] = self.history[row][0]["price"]
+                self.latest_recorded_at[row] = self.history[row][0]["recorded_at"]
+            if touched:
+                self._version += 1
+
+            # ids below the window are never read again, so stop tracking them
+            floor = self._price_cursor - CURSOR_OVERLAP
+            self._seen_price_ids = {i for i in self._seen_price_ids if i > floor}
+
+            self._refreshed_at = time.monotonic()
+
+    def _add_station(self, station_id, name, lat, lon):
+        self._rows_by_id[station_id] = len(self.ids)
+        self.ids.append(station_id)
+        self.names.append(name)
+        self.latitudes.append(lat)
+        self.longitudes.append(lon)
+        self.latest_prices.append(math.nan)
+        self.latest_recorded_at.append(None)
+        self.history.append([])
+
+    def _stale(self) -> bool:
+        return (
+            self._refreshed_at is None
+            or time.monotonic() - self._refreshed_at > self.max_age
+        )
+
+    def ensure_fresh(self):
+        if not self._stale():
+            return
+        with self._refresh_lock:
+            # whoever held the lock before us may have just refreshed
+            if self._stale():
+                self._fetch_and_apply()
+
+    # ----- reads -----
+
+    def _row_dict(self, row):
+        latest = self.latest_prices[row]
+        return {
+            "id": self.ids[row],
+            "name": self.names[row],
+            "latitude": self.latitudes[row],
+            "longitude": self.longitudes[row],
+            "latest_price": None if math.isnan(latest) else latest,
+            "recorded_at": self.latest_recorded_at[row],
+            "prices": list(self.history[row]),
+        }
+
+    def list_stations(self):
+        self.ensure_fresh()
+        with self._lock:
+            return [self._row_dict(row) for row in range(len(self.ids))]
+
+    def get_station(self, station_id: int):
+        self.ensure_fresh()
+        if (
+            station_id not in self._rows_by_id
+            and station_id > self._station_cursor
+            and time.monotonic() - self._refreshed_at > MISS_REFRESH_SECONDS
+        ):
+            # may have been created by another worker since our last refresh
+            self.refresh()
+        with self._lock:
+            row = self._rows_by_id.get(station_id)
+            return None if row is None else self._row_dict(row)
+
+    def columns(self) -> StationColumns:
+        """
+        Copy of the station columns for scanning without holding the lock.
+        The copy is reused until the next refresh changes something.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            if self._columns_version != self._version:
+                self._columns = StationColumns(
+                    ids=array("q", self.ids),
+                    names=list(self.names),
+                    latitudes=array("d", self.latitudes),
+                    longitudes=array("d", self.longitudes),
+                    latest_prices=array("d", self.latest_prices),
+                )
+                self._columns_version = self._version
+            return self._columns
+
+
+station_snapshot = StationSnapshot()
@@ -0,0 +1,51 @@
+import os
+from typing import Optional
+
+from fastapi import Request
+
+from app.firebase import get_auth
+
+# How many proxies in front of the app append the peer they saw to
+# X-Forwarded-For. Cloud Run's front end is one (the image sets 1); an
+# external load balancer in front of Cloud Run makes it 2. 0 means the app
+# is reached directly and the header is ignored.
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+
+def verified_uid(authorization: Optional[str]) -> Optional[str]:
+    """
+    Firebase uid from an optional "Bearer <token>" header, or None when the
+    header is missing or the token does not verify. For endpoints that work
+    signed out but treat signed-in callers individually.
+    """
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    try:
+        return get_auth().verify_id_token(authorization.split(" ", 1)[1])["uid"]
+    except Exception:
+        return None
+
+
+def client_address(request: Request) -> str:
+    # Entries left of the ones our proxies appended are whatever the client
+    # sent, so count from the right rather than trusting the first one.
+    if TRUSTED_PROXY_HOPS:
+        forwarded = [
+            host.strip()
+            for host in request.headers.get("x-forwarded-for", "").split(",")
+            if host.strip()
+        ]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+
+def caller_key(request: Request, authorization: Optional[str]) -> str:
+    """
+    Identify the caller: by Firebase uid when they send a valid token,
+    otherwise by client address.
+    """
+    uid = verified_uid(authorization)
+    if uid:
+        return f"uid:{uid}"
+    return f"ip:{client_address(request)}"
@@ -1,6 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import auth, stations, favorites, traffic
+from app.db.connection import READ_YOUR_WRITES_HEADER, ReadYourWritesMiddleware
+from app.metrics import RequestTimingMiddleware, render_metrics
+import logging
+import os
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 
 app = FastAPI()
 
@@ -11,10 +17,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all methods (GET, POST, OPTIONS, etc.)
     allow_headers=["*"],  # Allow all headers (including Authorization)
+    expose_headers=[READ_YOUR_WRITES_HEADER],  # so the web client can echo it back
 )
 
+# Keep a client's reads on the primary right after it writes, whichever
+# worker serves them
+app.add_middleware(ReadYourWritesMiddleware)
+
+
+# Record per-route latency for /metrics, including streamed bodies
+app.add_middleware(RequestTimingMiddleware)
+
+
 # Registering routes
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(stations.router, prefix="/stations", tags=["stations"])
 app.include_router(favorites.router, prefix="/favorites", tags=["favorites"])
 app.include_router(traffic.router, prefix="/traffic", tags=["traffic"])
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+logger = logging.getLogger("app.db.slow_query")
+
+# Queries slower than this (milliseconds) are logged. Unset disables the log.
+SLOW_QUERY_MS = os.getenv("SLOW_QUERY_MS")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, by route template",
+    ["method", "route", "status"],
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Time spent in cursor.execute, by statement",
+    ["statement"],
+)
+QUERY_ROWS = Counter(
+    "db_query_rows_total",
+    "Rows returned or affected, by statement",
+    ["statement"],
+)
+CONNECT_LATENCY = Histogram(
+    "db_connect_duration_seconds",
+    "Time spent opening a Postgres connection",
+)
+EXTERNAL_LATENCY = Histogram(
+    "external_api_duration_seconds",
+    "Time spent waiting on third-party APIs",
+    ["api"],
+)
+PRICE_CHECKS = Counter(
+    "price_submissions_total",
+    "Submitted prices by anomaly check outcome",
+    ["action"],
+)
+
+
+_STATEMENT_NAME = re.compile(r"^\s*--\s*name:\s*([\w.-]+)")
+
+
+def _sql_text(query) -> str:
+    if isinstance(query, bytes):
+        return query.decode(errors="replace")
+    return str(query)
+
+
+def normalize_sql(query) -> str:
+    return re.sub(r"\s+", " ", _sql_text(query)).strip()
+
+
+def statement_label(query) -> str:
+    """
+    Stable, low-cardinality label for a SQL statement. A statement can name
+    itself with a leading `-- name: <label>` comment. Otherwise the label is
+    a short hash of the whitespace-normalized SQL, so statements that share a
+    long prefix still get separate series. The slow-query log prints the SQL
+    next to the label, so a hash can be matched back to its statement.
+    """
+    named = _STATEMENT_NAME.match(_sql_text(query))
+    if named:
+        return named.group(1)
+    digest = hashlib.sha1(normalize_sql(query).encode()).hexdigest()[:12]
+    return f"sql-{digest}"
+
+
+def observe_query(query, seconds: float, rowcount: int):
+    label = statement_label(query)
+    QUERY_LATENCY.labels(label).observe(seconds)
+    if rowcount and rowcount > 0:
+        QUERY_ROWS.labels(label).inc(rowcount)
+    if SLOW_QUERY_MS is not None and seconds * 1000 >= float(SLOW_QUERY_MS):
+        logger.warning(
+            "slow query %s (%.1f ms, %s rows): %s",
+            label,
+            seconds * 1000,
+            rowcount,
+            normalize_sql(query),
+        )
+
+
+@contextmanager
+def timed_external(api: str):
+    """
+    Time a call to a third-party API, e.g. `with timed_external("directions"):`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        EXTERNAL_LATENCY.labels(api).observe(time.perf_counter() - start)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float):
+    REQUEST_LATENCY.labels(method, route, str(status)).observe(seconds)
+
+
+class RequestTimingMiddleware:
+    """
+    ASGI middleware recording per-route latency up to the last body chunk,
+    so streamed responses (e.g. /stations/plan-route/batch) are timed in full
+    rather than only until their headers go out.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        done = False
+
+        def finish():
+            nonlocal done
+            if done:
+                return
+            done = True
+            # the router stores the matched route in the shared scope; use its
+            # template (/stations/{station_id}) so ids don't become series
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            observe_request(scope["method"], path, status, time.perf_counter() - start)
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                finish()
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            finish()
+
+
+def render_metrics():
+    """
+    Return (body, content type) for the /metrics endpoint. When uvicorn runs
+    several workers, set PROMETHEUS_MULTIPROC_DIR so the counts are merged
+    across processes.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
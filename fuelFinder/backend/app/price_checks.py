@@ -0,0 +1,242 @@
+import logging
+import math
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from app.db.connection import get_read_connection
+from app.db.queries import MATCHING_QUARANTINED, SELECT_STATS
+from app.metrics import PRICE_CHECKS
+
+logger = logging.getLogger(__name__)
+
+# Weight of each new price in the running mean/variance. 0.1 means roughly
+# the last ten submissions dominate, so normal price moves are learned quickly.
+EWMA_ALPHA = 0.1
+# Submissions needed before a scope's statistics are trusted.
+MIN_SAMPLES = 5
+# Floors for the standard deviation, absolute and as a fraction of the mean.
+# A station whose price sat still has almost no variance, and without the
+# relative floor its first real move (say 3.49 -> 3.85) would be quarantined.
+MIN_STD = 0.05
+MIN_STD_FRACTION = 0.03
+FLAG_Z = 3.0
+QUARANTINE_Z = 6.0
+# Anything outside this range is a typo whatever the statistics say.
+MIN_PRICE = 0.5
+MAX_PRICE = 20.0
+# Size of the grid cells used for area statistics (about 11 km of latitude).
+AREA_CELL_DEGREES = 0.1
+# Other workers update the same rows, so cached statistics are re-read after this long.
+STATS_CACHE_SECONDS = 60
+# A quarantined value is accepted (as a flag) once this many different
+# submitters, counting the current one, agree on it within the tolerance and
+# window. Retries by the same submitter don't count.
+# Otherwise a real price jump would be held forever, because held prices
+# never update the statistics.
+CORROBORATING_SUBMISSIONS = 3
+CORROBORATION_TOLERANCE = 0.02
+CORROBORATION_WINDOW_HOURS = 24
+
+
+class Stats(NamedTuple):
+    n: int
+    mean: float
+    variance: float
+
+
+class Verdict(NamedTuple):
+    action: str  # "accept", "flag" or "quarantine"
+    z_score: Optional[float]
+    reason: str
+
+
+def station_scope(station_id: int) -> str:
+    return f"station:{station_id}"
+
+
+def area_scope(lat: float, lon: float) -> str:
+    # must match BACKFILL_STATS and the backfill in migrations/0003_price_stats.sql
+    return f"area:{math.floor(lat / AREA_CELL_DEGREES)}:{math.floor(lon / AREA_CELL_DEGREES)}"
+
+
+# Rebuild statistics from price history, as the 0003 migration's one-time
+# backfill does. Used after bulk loads such as benchmarks.seed.
+BACKFILL_STATS = [
+    """
+    INSERT INTO price_stats (scope, n, mean, variance)
+    SELECT 'station:' || station_id, COUNT(*), AVG(price), COALESCE(VAR_POP(price), 0)
+    FROM prices
+    GROUP BY station_id
+    ON CONFLICT (scope) DO NOTHING
+    """,
+    """
+    INSERT INTO price_stats (scope, n, mean, variance)
+    SELECT
+      'area:' || FLOOR(s.latitude / %(cell)s)::INTEGER
+        || ':' || FLOOR(s.longitude / %(cell)s)::INTEGER,
+      COUNT(*),
+      AVG(p.price),
+      COALESCE(VAR_POP(p.price), 0)
+    FROM prices p
+    JOIN stations s ON s.id = p.station_id
+    GROUP BY 1
+    ON CONFLICT (scope) DO NOTHING
+    """,
+]
+
+# Applied in SQL so concurrent submissions from every worker update the
+# persisted statistics atomically. The SET clause sees the old row, which is
+# what the incremental EWMA update needs.
+UPSERT_STATS = """
+    INSERT INTO price_stats (scope, n, mean, variance)
+    VALUES (%(scope)s, 1, %(price)s, 0)
+    ON CONFLICT (scope) DO UPDATE SET
+      n = price_stats.n + 1,
+      mean = price_stats.mean + %(alpha)s * (%(price)s - price_stats.mean),
+      variance = (1 - %(alpha)s) * (
+        price_stats.variance + %(alpha)s * (%(price)s - price_stats.mean) ^ 2
+      ),
+      updated_at = CURRENT_TIMESTAMP
+    RETURNING n, mean, variance
+"""
+
+
+class PriceValidator:
+    """
+    Checks each submitted price against running statistics for its station
+    and its area. The area decides until the station has enough history, and
+    can overrule a station quarantine. Every check and update is O(1).
+    Statistics are cached in memory and persisted in the price_stats table,
+    so price history is never re-scanned.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # scope -> (Stats or None if the scope has no row yet, expires at)
+        self._cache = {}
+
+    def _stats(self, scopes):
+        now = time.monotonic()
+        missing = [
+            scope
+            for scope in scopes
+            if scope not in self._cache or self._cache[scope][1] < now
+        ]
+        if missing:
+            conn = get_read_connection()
+            cur = conn.cursor()
+            cur.execute(SELECT_STATS, (missing,))
+            found = {row[0]: Stats(*row[1:]) for row in cur.fetchall()}
+            cur.close()
+            conn.close()
+            with self._lock:
+                for scope in missing:
+                    self._cache[scope] = (found.get(scope), now + STATS_CACHE_SECONDS)
+        return [self._cache[scope][0] for scope in scopes]
+
+    @staticmethod
+    def _judge(label: str, stats: Stats, price: float) -> Verdict:
+        std = max(math.sqrt(stats.variance), MIN_STD, MIN_STD_FRACTION * stats.mean)
+        z = abs(price - stats.mean) / std
+        reason = f"{z:.1f} std devs from {label} mean {stats.mean:.2f}"
+        if z > QUARANTINE_Z:
+            return Verdict("quarantine", z, reason)
+        if z > FLAG_Z:
+            return Verdict("flag", z, reason)
+        return Verdict("accept", z, reason)
+
+    def check(self, station_id: int, lat: float, lon: float, price: float) -> Verdict:
+        if not MIN_PRICE <= price <= MAX_PRICE:
+            return Verdict(
+                "quarantine", None, f"outside {MIN_PRICE:.2f}-{MAX_PRICE:.2f}"
+            )
+
+        verdicts = {}
+        scopes = [station_scope(station_id), area_scope(lat, lon)]
+        for label, stats in zip(("station", "area"), self._stats(scopes)):
+            if stats is not None and stats.n >= MIN_SAMPLES:
+                verdicts[label] = self._judge(label, stats, price)
+
+        station, area = verdicts.get("station"), verdicts.get("area")
+        if station is None:
+            return area or Verdict("accept", None, "not enough history")
+        if station.action == "quarantine" and area and area.action == "accept":
+            # the station's own history lags behind a real price move, but
+            # the price is normal for the area
+            return Verdict("flag", station.z_score, f"{station.reason}; {area.reason}")
+        return station
+
+    def review(
+        self,
+        cur,
+        station_id: int,
+        lat: float,
+        lon: float,
+        price: float,
+        submitted_by: str,
+    ) -> Verdict:
+        """
+        check(), except that a statistical quarantine becomes a flag when
+        other submitters recently sent the same price for the station, so
+        the new level gets recorded and the statistics catch up.
+        """
+        verdict = self.check(station_id, lat, lon, price)
+        if verdict.action != "quarantine" or verdict.z_score is None:
+            return verdict
+        cur.execute(
+            MATCHING_QUARANTINED,
+            {
+                "station_id": station_id,
+                "price": price,
+                "submitted_by": submitted_by,
+                "hours": CORROBORATION_WINDOW_HOURS,
+                "tolerance": CORROBORATION_TOLERANCE,
+            },
+        )
+        matches = cur.fetchone()[0]
+        if matches + 1 >= CORROBORATING_SUBMISSIONS:
+            return Verdict(
+                "flag", verdict.z_score, f"{verdict.reason}; confirmed by {matches} others"
+            )
+        return verdict
+
+    def record(self, cur, station_id: int, lat: float, lon: float, price: float):
+        """
+        Fold an accepted price into the station and area statistics. Runs on
+        the caller's cursor so it commits together with the price row.
+        """
+        for scope in (station_scope(station_id), area_scope(lat, lon)):
+            cur.execute(
+                UPSERT_STATS, {"scope": scope, "price": price, "alpha": EWMA_ALPHA}
+            )
+            stats = Stats(*cur.fetchone())
+            with self._lock:
+                self._cache[scope] = (stats, time.monotonic() + STATS_CACHE_SECONDS)
+
+    def quarantine(
+        self, cur, station_id: int, price: float, verdict: Verdict, submitted_by: str
+    ):
+        cur.execute(
+            """
+            INSERT INTO price_quarantine
+              (station_id, price, z_score, reason, submitted_by)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            (station_id, price, verdict.z_score, verdict.reason, submitted_by),
+        )
+
+
+price_validator = PriceValidator()
+
+
+def observe_verdict(station_id: int, price: float, verdict: Verdict):
+    PRICE_CHECKS.labels(verdict.action).inc()
+    if verdict.action != "accept":
+        logger.warning(
+            "Price %.2f for station %s %s: %s",
+            price,
+            station_id,
+            "quarantined" if verdict.action == "quarantine" else "flagged",
+            verdict.reason,
+        )
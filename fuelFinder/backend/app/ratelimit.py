@@ -0,0 +1,205 @@
+import math
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from fastapi import Header, HTTPException, Request
+
+from app.db.connection import get_read_connection
+from app.identity import client_address, verified_uid
+
+# Set RATE_LIMIT_ENABLED=0 to turn limiting off (the benchmark suite does).
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+# Optional shared store so every worker/instance draws from the same buckets.
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+# How long a user's plan is trusted before we look it up again.
+PLAN_CACHE_SECONDS = 300
+PLAN_CACHE_MAX_USERS = 10_000
+
+
+class Budget(NamedTuple):
+    capacity: int  # burst size
+    per_minute: float  # sustained rate
+
+    @property
+    def per_second(self) -> float:
+        return self.per_minute / 60
+
+
+# Costs are counted in external API calls: one token per Directions request,
+# so a batch of N trips draws N tokens from the same "plan-route" bucket as
+# single plan-route calls. Capacity is also the largest batch a plan allows.
+BUDGETS = {
+    "plan-route": {"free": Budget(10, 10), "premium": Budget(500, 250)},
+    "station-sentiment": {"free": Budget(3, 3), "premium": Budget(30, 30)},
+    # not an external API, but keeps one caller from flooding price checks
+    "add-price": {"free": Budget(10, 10), "premium": Budget(30, 30)},
+}
+
+
+class MemoryBucketStore:
+    """
+    Token buckets kept in this process. Each worker enforces its own share.
+    """
+
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> [tokens, last refill time]
+
+    def take(self, key: str, budget: Budget, cost: int = 1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (budget.capacity, now))
+            tokens = min(budget.capacity, tokens + (now - last) * budget.per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = [tokens, now]
+            if len(self._buckets) > self.MAX_KEYS:
+                self._prune(now)
+        if allowed:
+            return True, 0.0
+        return False, (cost - tokens) / budget.per_second
+
+    def _prune(self, now):
+        # A bucket idle long enough to have refilled behaves like a new one,
+        # so forgetting it changes nothing. An hour covers every budget above.
+        self._buckets = {
+            key: state for key, state in self._buckets.items() if now - state[1] < 3600
+        }
+
+
+class RedisBucketStore:
+    """
+    Token buckets shared through Redis, updated atomically by a Lua script.
+    """
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    if tokens >= cost then
+      tokens = tokens - cost
+      allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str):
+        import redis  # only needed when a shared store is configured
+
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def take(self, key: str, budget: Budget, cost: int = 1):
+        allowed, tokens = self._script(
+            keys=[f"ratelimit:{key}"],
+            args=[budget.capacity, budget.per_second, time.time(), cost],
+        )
+        if allowed:
+            return True, 0.0
+        return False, (cost - float(tokens)) / budget.per_second
+
+
+_store = RedisBucketStore(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else MemoryBucketStore()
+
+# firebase uid -> (is_premium, expires at)
+_plan_cache = {}
+
+
+def remember_plan(firebase_uid: str, is_premium: bool):
+    """
+    Record a user's plan. Called wherever we already read or change
+    users.is_premium, so the limiter rarely needs its own query.
+    """
+    now = time.monotonic()
+    _plan_cache[firebase_uid] = (is_premium, now + PLAN_CACHE_SECONDS)
+    if len(_plan_cache) > PLAN_CACHE_MAX_USERS:
+        _prune_plan_cache(now)
+
+
+def _prune_plan_cache(now):
+    # expired entries would be looked up again anyway, so dropping them is free
+    global _plan_cache
+    _plan_cache = {uid: entry for uid, entry in _plan_cache.items() if entry[1] > now}
+
+
+def _is_premium(firebase_uid: str) -> bool:
+    cached = _plan_cache.get(firebase_uid)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+
+    conn = get_read_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT is_premium FROM users WHERE firebase_uid = %s", (firebase_uid,))
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    is_premium = bool(row and row[0])
+    remember_plan(firebase_uid, is_premium)
+    return is_premium
+
+
+def _identify(request: Request, authorization: Optional[str]):
+    """
+    Signed-in callers are limited per user and get their plan's budget.
+    Anonymous callers, or callers with a bad token, get the free budget per
+    client address.
+    """
+    uid = verified_uid(authorization)
+    if uid:
+        return f"uid:{uid}", _is_premium(uid)
+    return f"ip:{client_address(request)}", False
+
+
+def enforce_rate_limit(
+    route: str, request: Request, authorization: Optional[str], cost: int = 1
+):
+    """
+    Charge `cost` tokens from the caller's `route` bucket, or raise 413 when
+    the request is bigger than the plan's burst, or 429 when the bucket is
+    empty. Handlers whose cost depends on the body call this directly.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    identity, premium = _identify(request, authorization)
+    plan = "premium" if premium else "free"
+    budget = BUDGETS[route][plan]
+    if cost > budget.capacity:
+        raise HTTPException(
+            status_code=413,
+            detail=(
+                f"This request costs {cost}; the {plan.title()} plan allows "
+                f"at most {budget.capacity} at once."
+            ),
+        )
+    allowed, retry_after = _store.take(f"{route}:{identity}", budget, cost)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded. Upgrade to Premium for a higher limit.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def rate_limit(route: str):
+    """
+    FastAPI dependency charging one token from the BUDGETS entry for `route`.
+    """
+    BUDGETS[route]  # fail at import time on a typo
+
+    def check(request: Request, authorization: Optional[str] = Header(None)):
+        enforce_rate_limit(route, request, authorization)
+
+    return check
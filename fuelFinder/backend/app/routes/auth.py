@@ -1,19 +1,10 @@
 from fastapi import APIRouter, Depends, Header, Request, HTTPException
-from app.db.connection import get_db_connection
-import firebase_admin
-from firebase_admin import credentials, auth
-import os
+from app.db.connection import get_db_connection, get_read_connection, mark_write
+from app.ratelimit import remember_plan
+from app.firebase import get_auth
 
 router = APIRouter()
 
-# ✅ Initialize Firebase Admin SDK once
-if not firebase_admin._apps:
-    cred_path = os.path.join(
-        os.path.dirname(__file__), "../credentials/firebase-service-account.json"
-    )
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
-
 
 @router.post("/register-user")
 async def register_user(request: Request):
@@ -25,7 +16,7 @@ async def register_user(request: Request):
 
     try:
         # Verify Firebase ID token
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = get_auth().verify_id_token(token)
         firebase_uid = decoded_token["uid"]
         email = decoded_token.get("email", "")
 
@@ -71,7 +62,7 @@ async def get_current_user_id(
     id_token = authorization.split(" ", 1)[1]
 
     try:
-        decoded = auth.verify_id_token(id_token)
+        decoded = get_auth().verify_id_token(id_token)
         firebase_uid = decoded["uid"]
     except Exception as e:
         raise HTTPException(401, f"Invalid token: {e}")
@@ -80,12 +71,13 @@ async def get_current_user_id(
     cur = conn.cursor()
     # ensure user exists (or register on‑the‑fly)
     cur.execute(
-        "SELECT id FROM users WHERE firebase_uid = %s",
+        "SELECT id, is_premium FROM users WHERE firebase_uid = %s",
         (firebase_uid,),
     )
     row = cur.fetchone()
     if row:
         user_id = row[0]
+        remember_plan(firebase_uid, row[1])
         # bump last_login
         cur.execute(
             "UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = %s",
@@ -98,6 +90,7 @@ async def get_current_user_id(
             (firebase_uid, decoded.get("email", "")),
         )
         user_id = cur.fetchone()[0]
+        remember_plan(firebase_uid, False)
 
     conn.commit()
     cur.close()
@@ -108,7 +101,7 @@ async def get_current_user_id(
 
 @router.get("/account")
 def get_account_info(user_id: int = Depends(get_current_user_id)):
-    conn = get_db_connection()
+    conn = get_read_connection(sticky_key=f"user:{user_id}")
     cur = conn.cursor()
     cur.execute(
         """
@@ -141,12 +134,15 @@ def toggle_premium_status(user_id: int = Depends(get_current_user_id)):
         UPDATE users
         SET is_premium = NOT is_premium
         WHERE id = %s
-        RETURNING is_premium
+        RETURNING is_premium, firebase_uid
         """,
         (user_id,),
     )
-    new_status = cur.fetchone()[0]
+    new_status, firebase_uid = cur.fetchone()
     conn.commit()
+    mark_write(f"user:{user_id}")
+    # new budget applies right away in this worker
+    remember_plan(firebase_uid, new_status)
     cur.close()
     conn.close()
 
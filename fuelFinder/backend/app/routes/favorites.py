@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import List
-from app.db.connection import get_db_connection
+from app.db.connection import get_db_connection, get_read_connection, mark_write
+from app.db.queries import LIST_FAVORITES_SQL
 from app.routes.auth import get_current_user_id
 from app.schemas import (
     StationWithPriceOut,
@@ -27,6 +28,7 @@ async def add_favorite(
             (user_id, station_id),
         )
         conn.commit()
+        mark_write(f"user:{user_id}")
     except Exception:
         conn.rollback()
         raise HTTPException(500, "Could not save favorite")
@@ -60,6 +62,7 @@ async def remove_favorite(
             # nothing to delete
             raise HTTPException(404, "Favorite not found")
         conn.commit()
+        mark_write(f"user:{user_id}")
     except HTTPException:
         conn.rollback()
         raise
@@ -76,52 +79,10 @@ async def remove_favorite(
 async def list_favorites(
     user_id: int = Depends(get_current_user_id),
 ):
-    conn = get_db_connection()
+    conn = get_read_connection(sticky_key=f"user:{user_id}")
     cur = conn.cursor()
     try:
-        cur.execute(
-            """
-            SELECT
-              s.id,
-              s.name,
-              s.latitude,
-              s.longitude,
-              (
-                SELECT price
-                FROM prices
-                WHERE station_id = s.id
-                ORDER BY recorded_at DESC
-                LIMIT 1
-              ) AS latest_price,
-              (
-                SELECT recorded_at
-                FROM prices
-                WHERE station_id = s.id
-                ORDER BY recorded_at DESC
-                LIMIT 1
-              ) AS recorded_at,
-              COALESCE(
-                (
-                  SELECT JSON_AGG(
-                           JSON_BUILD_OBJECT(
-                             'price',       p.price,
-                             'recorded_at', p.recorded_at
-                           )
-                           ORDER BY p.recorded_at DESC
-                         )
-                  FROM prices p
-                  WHERE p.station_id = s.id
-                ),
-                '[]'::json
-              ) AS prices
-            FROM stations s
-            JOIN favorites f
-              ON f.station_id = s.id
-            WHERE f.user_id = %s
-            ORDER BY s.id;
-            """,
-            (user_id,),
-        )
+        cur.execute(LIST_FAVORITES_SQL, (user_id,))
         rows = cur.fetchall()
     except Exception as e:
         conn.rollback()
@@ -1,10 +1,26 @@
-from fastapi import APIRouter, HTTPException, Request, Query
-from typing import List
-from app.db.connection import get_db_connection
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+from app.db.connection import (
+    get_db_connection,
+    has_recent_writes,
+    mark_write,
+    recently_wrote,
+    request_recently_wrote,
+)
+from app.db.snapshot import station_snapshot
+from app.identity import caller_key
+from app.metrics import timed_external
+from app.price_checks import observe_verdict, price_validator
+from app.ratelimit import enforce_rate_limit, rate_limit
+import json
+import logging
 import math
-import requests
+import multiprocessing
 import os
-import openai
+import threading
 from typing import List
 from app.db.connection import get_db_connection
 from app.schemas import (
@@ -15,10 +31,29 @@ from app.schemas import (
     PriceCreatedOut,
     RoutePlanRequest,
     RoutePlanResponse,
+    BatchRoutePlanRequest,
     FeedbackRequest
 )
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def reads_own_write(request: Request, authorization: Optional[str]) -> bool:
+    # caller_key() verifies the Firebase token, so only work out who the
+    # caller is when this worker has writes on record to match it against
+    if request_recently_wrote():
+        return True
+    return has_recent_writes() and recently_wrote(caller_key(request, authorization))
+
+
+def refresh_after_write():
+    # The row is already committed, so a failed refresh must not turn into a
+    # 500 that makes the client submit it again. The next read catches up.
+    try:
+        station_snapshot.refresh(use_primary=True)
+    except Exception:
+        logger.exception("Station snapshot refresh after write failed")
 
 
 # Create a station
@@ -40,6 +75,7 @@ def create_station(s: StationBase):
         )
         row = cur.fetchone()
         conn.commit()
+        refresh_after_write()
         return StationOut(id=row[0], name=row[1], latitude=row[2], longitude=row[3])
     except IntegrityError:
         conn.rollback()
@@ -54,82 +90,52 @@ def create_station(s: StationBase):
 
 # List all stations with their most recent price (if any)
 @router.get("/", response_model=List[StationWithPriceOut])
-def list_stations():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT
-            s.id,
-            s.name,
-            s.latitude,
-            s.longitude,
-            -- latest single price
-            (
-              SELECT price
-              FROM prices
-              WHERE station_id = s.id
-              ORDER BY recorded_at DESC
-              LIMIT 1
-            ) AS latest_price,
-            (
-              SELECT recorded_at
-              FROM prices
-              WHERE station_id = s.id
-              ORDER BY recorded_at DESC
-              LIMIT 1
-            ) AS recorded_at,
-            -- full price history as JSON array
-            COALESCE(
-              (
-                SELECT JSON_AGG(
-                  JSON_BUILD_OBJECT(
-                    'price', p.price,
-                    'recorded_at', p.recorded_at
-                  )
-                  ORDER BY p.recorded_at DESC
-                )
-                FROM prices p
-                WHERE p.station_id = s.id
-              ),
-              '[]'
-            ) AS prices
-        FROM stations s
-        ORDER BY s.id;
-    """
-    )
-    rows = cur.fetchall()
-    # build a list of column names in order
-    columns = [col[0] for col in cur.description]
-    result = []
-    for row in rows:
-        # zip together names and values into a dict
-        row_dict = dict(zip(columns, row))
-        result.append(
-            {
-                "id": row_dict["id"],
-                "name": row_dict["name"],
-                "latitude": row_dict["latitude"],
-                "longitude": row_dict["longitude"],
-                "latest_price": row_dict["latest_price"],
-                "recorded_at": row_dict["recorded_at"],
-                "prices": row_dict["prices"],
-            }
-        )
-    return result
+def list_stations(request: Request, authorization: Optional[str] = Header(None)):
+    # read-your-writes is per signed-in user, or per real client address
+    # for anonymous callers, so one submission doesn't pin everyone to the
+    # primary
+    if reads_own_write(request, authorization):
+        station_snapshot.refresh(use_primary=True)
+    return station_snapshot.list_stations()
 
 
 # Add a price record to a station
-@router.post("/{station_id}/prices", response_model=PriceCreatedOut, status_code=201)
-def add_price(station_id: int, p: PriceBase):
+@router.post(
+    "/{station_id}/prices",
+    response_model=PriceCreatedOut,
+    status_code=201,
+    dependencies=[Depends(rate_limit("add-price"))],
+)
+def add_price(
+    station_id: int,
+    p: PriceBase,
+    request: Request,
+    authorization: Optional[str] = Header(None),
+):
     conn = get_db_connection()
     cur = conn.cursor()
-    # ensure station exists
-    cur.execute("SELECT 1 FROM stations WHERE id = %s", (station_id,))
-    if cur.fetchone() is None:
+    # ensure station exists (its location picks the area statistics)
+    cur.execute("SELECT latitude, longitude FROM stations WHERE id = %s", (station_id,))
+    location = cur.fetchone()
+    if location is None:
         cur.close()
         conn.close()
         raise HTTPException(status_code=404, detail="Station not found")
+    lat, lon = location
+
+    # screen out fat-fingered prices before they become the "latest price"
+    submitter = caller_key(request, authorization)
+    verdict = price_validator.review(cur, station_id, lat, lon, p.price, submitter)
+    observe_verdict(station_id, p.price, verdict)
+    if verdict.action == "quarantine":
+        price_validator.quarantine(cur, station_id, p.price, verdict, submitter)
+        conn.commit()
+        cur.close()
+        conn.close()
+        raise HTTPException(
+            status_code=422,
+            detail=f"Price looks wrong ({verdict.reason}) and was held for review.",
+        )
 
     cur.execute(
         """
@@ -140,9 +146,12 @@ def add_price(station_id: int, p: PriceBase):
         (station_id, p.price),
     )
     row = cur.fetchone()
+    price_validator.record(cur, station_id, lat, lon, p.price)
     conn.commit()
     cur.close()
     conn.close()
+    mark_write(submitter)
+    refresh_after_write()
     return PriceCreatedOut(
         id=row[0],
         station_id=row[1],
@@ -183,68 +192,48 @@ def haversine(lat1, lon1, lat2, lon2):
     return R * c
 
 
-# --- Route: Plan route with gas stops ---
-@router.post("/plan-route", response_model=RoutePlanResponse)
-def plan_route(request: RoutePlanRequest):
-    api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="Missing Google Maps API key")
-
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # Step 1: Fetch all stations with latest price
-    cur.execute(
-        """
-        SELECT
-            s.id, s.name, s.latitude, s.longitude,
-            (
-              SELECT price FROM prices
-              WHERE station_id = s.id
-              ORDER BY recorded_at DESC LIMIT 1
-            ) AS latest_price
-        FROM stations s
-        WHERE (
-            SELECT price FROM prices WHERE station_id = s.id ORDER BY recorded_at DESC LIMIT 1
-        ) IS NOT NULL;
+# --- Helpers shared by single and batch route planning ---
+def select_stops(columns, request: RoutePlanRequest):
+    """
+    Keep the stations within max_detour_km of the straight line trip and
+    return the num_stations cheapest of them. `columns` is a StationColumns
+    from the station snapshot; only stations that pass get a dict built.
     """
-    )
-    rows = cur.fetchall()
-    columns = [col[0] for col in cur.description]
-    stations = [dict(zip(columns, row)) for row in rows]
-    cur.close()
-    conn.close()
-
     current = (request.current_lat, request.current_lon)
     dest = (request.destination_lat, request.destination_lon)
     direct_distance = haversine(*current, *dest)
 
-    # Step 2: Filter stations by detour
     valid = []
-    for s in stations:
-        station_loc = (s["latitude"], s["longitude"])
-        to_station = haversine(*current, *station_loc)
-        from_station = haversine(*station_loc, *dest)
+    for index, (lat, lon, price) in enumerate(
+        zip(columns.latitudes, columns.longitudes, columns.latest_prices)
+    ):
+        if math.isnan(price):
+            continue
+        to_station = haversine(*current, lat, lon)
+        from_station = haversine(lat, lon, *dest)
         detour = to_station + from_station - direct_distance
 
         if detour <= request.max_detour_km:
             valid.append(
                 {
-                    "id": s["id"],
-                    "name": s["name"],
-                    "latitude": s["latitude"],
-                    "longitude": s["longitude"],
-                    "latest_price": s["latest_price"],
+                    "id": columns.ids[index],
+                    "name": columns.names[index],
+                    "latitude": lat,
+                    "longitude": lon,
+                    "latest_price": price,
                     "detour_km": round(detour, 2),
                     "prices": [],
                     "recorded_at": None,
                 }
             )
 
-    # Step 3: Pick up to N cheapest stations
-    best_stops = sorted(valid, key=lambda x: x["latest_price"])[: request.num_stations]
+    return sorted(valid, key=lambda x: x["latest_price"])[: request.num_stations]
 
-    # Step 4: Build Directions API call
+
+def build_route(request: RoutePlanRequest, best_stops, api_key: str):
+    """
+    Ask the Google Directions API for a route through the chosen stops.
+    """
     waypoints_str = "|".join([f"{s['latitude']},{s['longitude']}" for s in best_stops])
     params = {
         "origin": f"{request.current_lat},{request.current_lon}",
@@ -253,8 +242,11 @@ def plan_route(request: RoutePlanRequest):
         "key": api_key,
     }
 
+    import requests  # imported on first use to keep cold starts fast
+
     url = "https://maps.googleapis.com/maps/api/directions/json"
-    resp = requests.get(url, params=params).json()
+    with timed_external("directions"):
+        resp = requests.get(url, params=params).json()
 
     if resp["status"] != "OK":
         raise HTTPException(status_code=500, detail="Google Directions API failed")
@@ -272,6 +264,115 @@ def plan_route(request: RoutePlanRequest):
     )
 
 
+# --- Route: Plan route with gas stops ---
+@router.post(
+    "/plan-route",
+    response_model=RoutePlanResponse,
+    dependencies=[Depends(rate_limit("plan-route"))],
+)
+def plan_route(request: RoutePlanRequest):
+    api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Missing Google Maps API key")
+
+    best_stops = select_stops(station_snapshot.columns(), request)
+    return build_route(request, best_stops, api_key)
+
+
+# --- Route: Plan many routes at once (fleet customers) ---
+# Below this many (trips x stations) detour checks a process pool costs more
+# to start than it saves, so the scan runs in the request thread instead.
+BATCH_PROCESS_POOL_THRESHOLD = 200_000
+BATCH_DIRECTIONS_WORKERS = int(os.getenv("BATCH_DIRECTIONS_WORKERS", "8"))
+
+# One pool per uvicorn worker, shared by every batch request and created on
+# first use. It uses forkserver (spawn where that is missing) because forking
+# a multithreaded server process can copy locks held by other threads.
+BATCH_PROCESS_WORKERS = int(
+    os.getenv("BATCH_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1)))
+)
+
+_stops_pool = None
+_stops_pool_lock = threading.Lock()
+
+
+def _get_stops_pool():
+    global _stops_pool
+    with _stops_pool_lock:
+        if _stops_pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in methods else "spawn"
+            )
+            _stops_pool = ProcessPoolExecutor(
+                max_workers=BATCH_PROCESS_WORKERS, mp_context=context
+            )
+        return _stops_pool
+
+
+def _select_stops_chunk(columns, trips):
+    return [select_stops(columns, trip) for trip in trips]
+
+
+def _plan_batch_stops(columns, trips):
+    global _stops_pool
+    if len(trips) * len(columns.ids) < BATCH_PROCESS_POOL_THRESHOLD:
+        return _select_stops_chunk(columns, trips)
+
+    # one chunk per pool process, so the station columns (plain arrays, cheap
+    # to pickle) are sent once per process per batch
+    size = math.ceil(len(trips) / BATCH_PROCESS_WORKERS)
+    chunks = [trips[i : i + size] for i in range(0, len(trips), size)]
+    try:
+        pool = _get_stops_pool()
+        futures = [pool.submit(_select_stops_chunk, columns, chunk) for chunk in chunks]
+        return [stops for future in futures for stops in future.result()]
+    except BrokenProcessPool:
+        logger.warning("Route planning pool died; recreating it on next batch")
+        with _stops_pool_lock:
+            _stops_pool = None
+        return _select_stops_chunk(columns, trips)
+
+
+@router.post("/plan-route/batch")
+def plan_route_batch(
+    batch: BatchRoutePlanRequest,
+    request: Request,
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Plan every trip in the batch against a single load of the station table.
+    Results are streamed back as newline-delimited JSON, one line per trip in
+    the order they finish; each line carries the trip's index in the request.
+    Each trip is a Directions call, so each one counts against the caller's
+    plan-route limit.
+    """
+    enforce_rate_limit("plan-route", request, authorization, cost=len(batch.trips))
+    api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Missing Google Maps API key")
+
+    all_stops = _plan_batch_stops(station_snapshot.columns(), batch.trips)
+
+    def results():
+        with ThreadPoolExecutor(max_workers=BATCH_DIRECTIONS_WORKERS) as pool:
+            futures = {
+                pool.submit(build_route, trip, stops, api_key): index
+                for index, (trip, stops) in enumerate(zip(batch.trips, all_stops))
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    line = {"index": index, "result": future.result().model_dump(mode="json")}
+                except HTTPException as e:
+                    line = {"index": index, "error": e.detail}
+                except Exception as e:
+                    line = {"index": index, "error": str(e)}
+                yield json.dumps(line) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
 # This will be changed lated should we want to add a populate nearby to
 # add gas stations to the database.
 @router.post("/populate-nearby")
@@ -280,72 +381,29 @@ async def populate_nearby(request: Request):
     Dummy route that accepts user coordinates and always returns success.
     """
     body = await request.json()
-    print("Received /populate-nearby request:", body)
+    logger.info("Received /populate-nearby request: %s", body)
     return {"status": "ok"}
 
 
 
 # get info on a single station
 @router.get("/{station_id}", response_model=StationWithPriceOut)
-def get_station_by_id(station_id: int):
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    cur.execute(
-        """
-        SELECT
-            s.id,
-            s.name,
-            s.latitude,
-            s.longitude,
-            (
-              SELECT price FROM prices WHERE station_id = s.id ORDER BY recorded_at DESC LIMIT 1
-            ) AS latest_price,
-            (
-              SELECT recorded_at FROM prices WHERE station_id = s.id ORDER BY recorded_at DESC LIMIT 1
-            ) AS recorded_at,
-            COALESCE(
-              (
-                SELECT JSON_AGG(
-                  JSON_BUILD_OBJECT(
-                    'price', p.price,
-                    'recorded_at', p.recorded_at
-                  )
-                  ORDER BY p.recorded_at DESC
-                )
-                FROM prices p
-                WHERE p.station_id = s.id
-              ),
-              '[]'
-            ) AS prices
-        FROM stations s
-        WHERE s.id = %s
-        """,
-        (station_id,)
-    )
-    row = cur.fetchone()
-    if not row:
+def get_station_by_id(
+    station_id: int, request: Request, authorization: Optional[str] = Header(None)
+):
+    if reads_own_write(request, authorization):
+        station_snapshot.refresh(use_primary=True)
+    station = station_snapshot.get_station(station_id)
+    if station is None:
         raise HTTPException(status_code=404, detail="Station not found")
+    return station
 
-    columns = [col[0] for col in cur.description]
-    row_dict = dict(zip(columns, row))
-    cur.close()
-    conn.close()
-
-    return {
-        "id": row_dict["id"],
-        "name": row_dict["name"],
-        "latitude": row_dict["latitude"],
-        "longitude": row_dict["longitude"],
-        "latest_price": row_dict["latest_price"],
-        "recorded_at": row_dict["recorded_at"],
-        "prices": row_dict["prices"],
-    }
 
 
 
-
-@router.post("/station-sentiment")
+@router.post(
+    "/station-sentiment", dependencies=[Depends(rate_limit("station-sentiment"))]
+)
 def get_sentiment(data: FeedbackRequest):
     # Step 1: Get place ID from Google Maps Place Search
     gmaps_key = os.getenv("GOOGLE_MAPS_API_KEY")
@@ -353,12 +411,17 @@ def get_sentiment(data: FeedbackRequest):
     if not gmaps_key or not openai_key:
         raise HTTPException(status_code=500, detail="Missing API keys.")
 
+    # imported on first use to keep cold starts fast
+    import openai
+    import requests
+
     place_search_url = (
         f"https://maps.googleapis.com/maps/api/place/nearbysearch/json"
         f"?location={data.latitude},{data.longitude}&radius=50"
         f"&keyword={data.name}&key={gmaps_key}"
     )
-    res = requests.get(place_search_url).json()
+    with timed_external("places_search"):
+        res = requests.get(place_search_url).json()
     place_id = res["results"][0]["place_id"] if res["results"] else None
     if not place_id:
         raise HTTPException(status_code=404, detail="Place not found.")
@@ -368,7 +431,8 @@ def get_sentiment(data: FeedbackRequest):
         f"https://maps.googleapis.com/maps/api/place/details/json"
         f"?place_id={place_id}&fields=review&key={gmaps_key}"
     )
-    reviews_res = requests.get(details_url).json()
+    with timed_external("places_details"):
+        reviews_res = requests.get(details_url).json()
     reviews = reviews_res.get("result", {}).get("reviews", [])
 
     if not reviews:
@@ -383,16 +447,17 @@ def get_sentiment(data: FeedbackRequest):
 
     openai.api_key = openai_key
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a sentiment analysis assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-        )
+        with timed_external("openai"):
+            response = openai.chat.completions.create(
+                model="gpt-4",
+                messages=[
+                    {"role": "system", "content": "You are a sentiment analysis assistant."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+            )
         summary = response.choices[0].message.content.strip()
         return {"summary": summary}
     except Exception as e:
-        print("OpenAI Error:", str(e))
+        logger.error("OpenAI Error: %s", e)
         raise HTTPException(status_code=500, detail="Sentiment analysis failed.")
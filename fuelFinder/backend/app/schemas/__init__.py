@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import List, Optional
 
@@ -60,6 +60,10 @@ class RoutePlanResponse(BaseModel):
     waypoints: List[StationWithPriceOut]
 
 
+class BatchRoutePlanRequest(BaseModel):
+    trips: List[RoutePlanRequest] = Field(..., min_length=1, max_length=500)
+
+
 class TrafficLog(BaseModel):
     latitude: float
     longitude: float
@@ -0,0 +1,10 @@
+"""
+The FastAPI app with external services replaced by benchmarks.fakes.
+
+    uvicorn benchmarks.bench_app:app --port 8100
+"""
+from benchmarks import fakes
+
+fakes.install()
+
+from app.main import app  # noqa: E402
@@ -0,0 +1,92 @@
+"""
+Local stand-ins for Firebase, the Google Maps APIs and OpenAI.
+
+install() must run before app.main is imported. It swaps the real clients for
+fakes that answer instantly, or after BENCH_FAKE_API_LATENCY_MS milliseconds
+if that is set. The benchmark then measures our code and the database, not
+third-party services.
+"""
+import os
+import sys
+import time
+import types
+
+import requests
+
+FAKE_API_LATENCY = float(os.getenv("BENCH_FAKE_API_LATENCY_MS", "0")) / 1000
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+        self.status_code = 200
+
+    def json(self):
+        return self._payload
+
+
+def fake_verify_id_token(token, *args, **kwargs):
+    # Seeded users log in with their firebase uid as the token.
+    if not token.startswith("bench-user-"):
+        raise ValueError("unknown benchmark token")
+    return {"uid": token, "email": f"{token}@example.com"}
+
+
+def _fake_directions(params):
+    stops = [w for w in (params or {}).get("waypoints", "").split("|") if w]
+    leg = {"distance": {"value": 8000}, "duration": {"value": 600}}
+    return {
+        "status": "OK",
+        "routes": [
+            {
+                "legs": [leg] * (len(stops) + 1),
+                "overview_polyline": {"points": "_p~iF~ps|U_ulLnnqC_mqNvxq`@"},
+            }
+        ],
+    }
+
+
+_real_get = requests.get
+
+
+def fake_get(url, params=None, **kwargs):
+    if "maps.googleapis.com" not in url:
+        return _real_get(url, params=params, **kwargs)
+
+    if FAKE_API_LATENCY:
+        time.sleep(FAKE_API_LATENCY)
+    if "/directions/" in url:
+        return FakeResponse(_fake_directions(params))
+    if "/place/nearbysearch/" in url:
+        return FakeResponse({"results": [{"place_id": "bench-place"}]})
+    if "/place/details/" in url:
+        return FakeResponse(
+            {"result": {"reviews": [{"text": "Clean pumps, fair prices."}] * 5}}
+        )
+    raise ValueError(f"No fake for {url}")
+
+
+def _fake_chat_completion(**kwargs):
+    if FAKE_API_LATENCY:
+        time.sleep(FAKE_API_LATENCY)
+    message = types.SimpleNamespace(content="Mostly positive reviews.")
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+def _fake_openai_module():
+    module = types.ModuleType("openai")
+    module.api_key = None
+    module.chat = types.SimpleNamespace(
+        completions=types.SimpleNamespace(create=_fake_chat_completion)
+    )
+    return module
+
+
+def install():
+    from app import firebase
+
+    # Stands in for firebase_admin.auth, so the Admin SDK is never loaded.
+    firebase._auth = types.SimpleNamespace(verify_id_token=fake_verify_id_token)
+
+    requests.get = fake_get
+    sys.modules["openai"] = _fake_openai_module()
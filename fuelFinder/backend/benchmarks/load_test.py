@@ -0,0 +1,274 @@
+"""
+Drive every API route at a fixed concurrency and report latency percentiles.
+
+Seed the database first (see benchmarks.seed), then from fuelFinder/backend:
+
+    python -m benchmarks.load_test --concurrency 16 --requests 2000
+
+By default this starts `uvicorn benchmarks.bench_app:app` locally. That app
+uses fake Firebase, Google and OpenAI clients. Pass --base-url to test a
+server that is already running instead. Use --json to save the results, so
+runs from different releases can be compared.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.seed import LAT_RANGE, LON_RANGE, bench_uid
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+
+class Scenario:
+    """
+    One route under test. make_request(rng) returns the keyword arguments
+    for requests.Session.request.
+    """
+
+    def __init__(self, name, make_request):
+        self.name = name
+        self.make_request = make_request
+
+
+def _auth(rng, users):
+    return {"Authorization": f"Bearer {bench_uid(rng.randint(1, users))}"}
+
+
+def _random_point(rng):
+    return rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)
+
+
+def build_scenarios(base_url, stations, users):
+    station_ids = [s["id"] for s in stations]
+    # spread like real submissions: mostly small moves around the current
+    # price, sometimes a bigger step (the anomaly check flags those but
+    # should still record them)
+    latest_prices = [s["latest_price"] or 3.5 for s in stations]
+
+    def list_stations(rng):
+        return {"method": "GET", "url": f"{base_url}/stations/"}
+
+    def get_station(rng):
+        station_id = rng.choice(station_ids)
+        return {"method": "GET", "url": f"{base_url}/stations/{station_id}"}
+
+    def add_price(rng):
+        index = rng.randrange(len(station_ids))
+        if rng.random() < 0.1:
+            change = rng.choice((-1, 1)) * rng.uniform(0.30, 0.50)
+        else:
+            change = rng.uniform(-0.25, 0.25)
+        return {
+            "method": "POST",
+            "url": f"{base_url}/stations/{station_ids[index]}/prices",
+            "json": {"price": round(latest_prices[index] + change, 2)},
+        }
+
+    def plan_route(rng):
+        (lat1, lon1), (lat2, lon2) = _random_point(rng), _random_point(rng)
+        return {
+            "method": "POST",
+            "url": f"{base_url}/stations/plan-route",
+            "json": {
+                "current_lat": lat1,
+                "current_lon": lon1,
+                "destination_lat": lat2,
+                "destination_lon": lon2,
+            },
+        }
+
+    def list_favorites(rng):
+        return {
+            "method": "GET",
+            "url": f"{base_url}/favorites/",
+            "headers": _auth(rng, users),
+        }
+
+    def add_favorite(rng):
+        station_id = rng.choice(station_ids)
+        return {
+            "method": "POST",
+            "url": f"{base_url}/favorites/{station_id}",
+            "headers": _auth(rng, users),
+        }
+
+    def log_traffic(rng):
+        lat, lon = _random_point(rng)
+        return {
+            "method": "POST",
+            "url": f"{base_url}/traffic/",
+            "headers": _auth(rng, users),
+            "json": {"latitude": lat, "longitude": lon},
+        }
+
+    return [
+        Scenario("list", list_stations),
+        Scenario("get", get_station),
+        Scenario("add_price", add_price),
+        Scenario("plan_route", plan_route),
+        Scenario("favorites_list", list_favorites),
+        Scenario("favorites_add", add_favorite),
+        Scenario("traffic", log_traffic),
+    ]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(scenario, total, concurrency, seed):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        session = requests.Session()
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            kwargs = scenario.make_request(rng)
+            start = time.perf_counter()
+            try:
+                ok = session.request(timeout=60, **kwargs).status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "scenario": scenario.name,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def start_server(port, workers):
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "benchmarks.bench_app:app",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env={
+            **os.environ,
+            "GOOGLE_MAPS_API_KEY": "bench",
+            "OPENAI_API_KEY": "bench",
+            "RATE_LIMIT_ENABLED": "0",
+        },
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("benchmark server exited during startup")
+        try:
+            if requests.get(f"{base_url}/stations/", timeout=2).ok:
+                return proc, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError("benchmark server did not come up within 30s")
+
+
+def print_table(results):
+    header = f"{'scenario':<16}{'reqs':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['scenario']:<16}{r['requests']:>8}{r['errors']:>8}{r['throughput_rps']:>10}"
+            f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--base-url", help="test an already running server")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument("--users", type=int, default=200, help="users seeded")
+    parser.add_argument(
+        "--scenarios", help="comma separated subset, e.g. list,get,plan_route"
+    )
+    parser.add_argument("--seed", type=int, default=336)
+    parser.add_argument("--json", help="write results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    proc = None
+    base_url = args.base_url
+    if base_url is None:
+        proc, base_url = start_server(args.port, args.workers)
+
+    try:
+        stations = requests.get(f"{base_url}/stations/").json()
+        if not stations:
+            raise SystemExit("No stations found; run `python -m benchmarks.seed` first.")
+
+        scenarios = build_scenarios(base_url, stations, args.users)
+        if args.scenarios:
+            wanted = set(args.scenarios.split(","))
+            scenarios = [s for s in scenarios if s.name in wanted]
+
+        results = []
+        for index, scenario in enumerate(scenarios):
+            results.append(
+                run_scenario(scenario, args.requests, args.concurrency, args.seed + index)
+            )
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "concurrency": args.concurrency,
+                    "requests_per_scenario": args.requests,
+                    "workers": args.workers,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
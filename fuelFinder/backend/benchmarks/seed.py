@@ -0,0 +1,143 @@
+"""
+Seed a local Postgres with synthetic data for the benchmark suite.
+
+Run from fuelFinder/backend with POSTGRES_* pointing at a throwaway database:
+
+    python -m benchmarks.seed --stations 2000 --prices-per-station 20 \
+        --users 500 --favorites-per-user 5 --traffic-per-user 50
+
+Existing rows are wiped first so every run starts from the same data.
+The random seed is fixed, so the same arguments always give the same data.
+"""
+import argparse
+import random
+
+from psycopg2.extras import execute_values
+
+from app.db.connection import get_db_connection
+from app.price_checks import AREA_CELL_DEGREES, BACKFILL_STATS
+from init_db import migrate
+
+# Roughly the New York metro area, so plan-route trips have realistic detours.
+LAT_RANGE = (40.45, 41.05)
+LON_RANGE = (-74.30, -73.65)
+
+
+def bench_uid(n: int) -> str:
+    """
+    Firebase uid of the n-th seeded user. The fake auth in benchmarks.fakes
+    accepts this string directly as the bearer token.
+    """
+    return f"bench-user-{n}"
+
+
+def seed(cur, args):
+    rng = random.Random(args.seed)
+
+    cur.execute(
+        """
+        TRUNCATE favorites, user_traffic, prices, stations, users,
+          price_stats, price_quarantine
+        RESTART IDENTITY CASCADE
+        """
+    )
+
+    stations = set()
+    while len(stations) < args.stations:
+        stations.add(
+            (round(rng.uniform(*LAT_RANGE), 6), round(rng.uniform(*LON_RANGE), 6))
+        )
+    execute_values(
+        cur,
+        "INSERT INTO stations (name, latitude, longitude) VALUES %s",
+        [(f"Bench Station {i}", lat, lon) for i, (lat, lon) in enumerate(stations, 1)],
+        page_size=1000,
+    )
+
+    prices = []
+    for station_id in range(1, args.stations + 1):
+        base = rng.uniform(3.0, 4.5)
+        for days_ago in range(args.prices_per_station, 0, -1):
+            prices.append(
+                (
+                    station_id,
+                    round(base + rng.uniform(-0.25, 0.25), 2),
+                    f"{days_ago} days",
+                )
+            )
+    execute_values(
+        cur,
+        "INSERT INTO prices (station_id, price, recorded_at) VALUES %s",
+        prices,
+        template="(%s, %s, now() - %s::interval)",
+        page_size=5000,
+    )
+    # price checks in add_price read these, so they must match the new prices
+    for statement in BACKFILL_STATS:
+        cur.execute(statement, {"cell": AREA_CELL_DEGREES})
+
+    execute_values(
+        cur,
+        "INSERT INTO users (firebase_uid, email) VALUES %s",
+        [(bench_uid(n), f"{bench_uid(n)}@example.com") for n in range(1, args.users + 1)],
+        page_size=1000,
+    )
+
+    favorites = []
+    for user_id in range(1, args.users + 1):
+        count = min(args.favorites_per_user, args.stations)
+        for station_id in rng.sample(range(1, args.stations + 1), count):
+            favorites.append((user_id, station_id))
+    execute_values(
+        cur,
+        "INSERT INTO favorites (user_id, station_id) VALUES %s",
+        favorites,
+        page_size=5000,
+    )
+
+    traffic = []
+    for user_id in range(1, args.users + 1):
+        for _ in range(args.traffic_per_user):
+            traffic.append(
+                (user_id, rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE))
+            )
+    execute_values(
+        cur,
+        "INSERT INTO user_traffic (user_id, latitude, longitude) VALUES %s",
+        traffic,
+        page_size=5000,
+    )
+
+    cur.execute("ANALYZE")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--stations", type=int, default=1000)
+    parser.add_argument("--prices-per-station", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--favorites-per-user", type=int, default=5)
+    parser.add_argument("--traffic-per-user", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=336)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    migrate()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        seed(cur, args)
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    print(
+        f"Seeded {args.stations} stations, "
+        f"{args.stations * args.prices_per_station} prices, {args.users} users"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Measure how long a fresh backend process takes to become useful.
+
+Run from fuelFinder/backend against a seeded database:
+
+    python -m benchmarks.startup --runs 5
+
+For each run this reports two timings. The first is how long `import app.main`
+takes in a new interpreter. The second is how long a new uvicorn process
+takes to answer its first request, plus how long that first /stations/ call
+takes. --importtime prints the slowest modules from `python -X importtime`,
+which shows what a change pulled back into the startup path.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import():
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:limit]
+
+
+def measure_first_response(port):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "benchmarks.bench_app:app",
+            "--port", str(port), "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "RATE_LIMIT_ENABLED": "0"},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError("server exited during startup")
+            if time.perf_counter() - start > 60:
+                raise RuntimeError("server did not answer within 60s")
+            try:
+                if requests.get(f"{base_url}/metrics", timeout=1).ok:
+                    break
+            except requests.RequestException:
+                time.sleep(0.02)
+        first_response = time.perf_counter() - start
+
+        t = time.perf_counter()
+        requests.get(f"{base_url}/stations/", timeout=30).raise_for_status()
+        first_stations = time.perf_counter() - t
+    finally:
+        proc.terminate()
+        proc.wait()
+    return first_response, first_stations
+
+
+def summarize(values):
+    return {
+        "median_ms": round(statistics.median(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--importtime", type=int, metavar="N", default=0,
+                        help="also list the N slowest imports")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    imports, first_responses, first_stations = [], [], []
+    for _ in range(args.runs):
+        imports.append(measure_import())
+        response, stations = measure_first_response(args.port)
+        first_responses.append(response)
+        first_stations.append(stations)
+
+    results = {
+        "runs": args.runs,
+        "import_app_main": summarize(imports),
+        "time_to_first_response": summarize(first_responses),
+        "first_list_stations": summarize(first_stations),
+    }
+    for name, summary in results.items():
+        if name != "runs":
+            print(f"{name:<24} median {summary['median_ms']:>8} ms   max {summary['max_ms']:>8} ms")
+
+    if args.importtime:
+        print("\nslowest imports (cumulative):")
+        for cumulative, name in slowest_imports(args.importtime):
+            print(f"{cumulative / 1000:>10.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,225 @@
+"""
+Apply the versioned SQL migrations in app/db/migrations.
+
+    python init_db.py          # apply any migrations not yet recorded
+    python init_db.py status   # list applied and pending migrations
+    python init_db.py check    # EXPLAIN the routes' hot queries and confirm they use indexes
+
+Migrations are files named NNNN_description.sql and run in version order.
+Each version is recorded in schema_migrations, so re-running is a no-op.
+A file whose first line is `-- migrate: no-transaction` runs one statement
+at a time in autocommit mode. CREATE INDEX CONCURRENTLY needs that, and it
+stops index builds from locking live tables.
+"""
 from app.db.connection import get_db_connection
+from app.db.queries import (
+    LIST_FAVORITES_SQL,
+    MATCHING_QUARANTINED,
+    NEW_PRICES_SQL,
+    NEW_STATIONS_SQL,
+    SELECT_STATS,
+)
 import os
+import re
+import sys
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "app", "db", "migrations")
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+# Any constant works; it only has to be the same for every migrator.
+MIGRATION_LOCK_ID = 336_000_001
+CONCURRENT_INDEX = re.compile(
+    r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)",
+    re.IGNORECASE,
+)
+
+
+def list_migrations():
+    migrations = []
+    for fname in sorted(os.listdir(MIGRATIONS_DIR)):
+        if fname.endswith(".sql"):
+            version = fname.split("_", 1)[0]
+            migrations.append((version, fname))
+    return migrations
+
+
+def split_statements(sql: str):
+    """
+    Split a migration into statements. Our migrations are plain DDL with no
+    function bodies, so splitting on semicolons is enough.
+    """
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+
+def concurrent_index_names(statements):
+    return [
+        match.group(1)
+        for match in map(CONCURRENT_INDEX.match, statements)
+        if match
+    ]
+
+
+def drop_invalid_indexes(cur, index_names):
+    # An interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index behind,
+    # which IF NOT EXISTS would then skip over. Drop those so they get rebuilt.
+    # Only indexes this migration creates are touched: any other invalid
+    # index may be one another session is building right now.
+    if not index_names:
+        return
+    cur.execute(
+        """
+        SELECT i.indexrelid::regclass::text
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE NOT i.indisvalid AND n.nspname = 'public' AND c.relname = ANY(%s)
+        """,
+        (list(index_names),),
+    )
+    for (index_name,) in cur.fetchall():
+        print(f"Dropping invalid index {index_name}")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+def applied_versions(cur):
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def migrate():
+    conn = get_db_connection()
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+              version TEXT PRIMARY KEY,
+              name TEXT NOT NULL,
+              applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        # one migrator at a time, e.g. when several instances deploy together
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        done = applied_versions(cur)
+
+        for version, fname in list_migrations():
+            if version in done:
+                continue
+            with open(os.path.join(MIGRATIONS_DIR, fname)) as f:
+                sql = f.read()
+
+            if sql.startswith(NO_TRANSACTION_MARKER):
+                statements = split_statements(sql)
+                drop_invalid_indexes(cur, concurrent_index_names(statements))
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, fname),
+                )
+            else:
+                conn.autocommit = False
+                try:
+                    cur.execute(sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (version, fname),
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.autocommit = True
+            print(f"Applied {fname}")
+
+        cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+    finally:
+        cur.close()
+        conn.close()
+
+
+def status():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT to_regclass('schema_migrations')")
+        done = applied_versions(cur) if cur.fetchone()[0] else set()
+    finally:
+        cur.close()
+        conn.close()
+    for version, fname in list_migrations():
+        print(f"{'applied' if version in done else 'pending'}  {fname}")
 
 
-def run_sql_file(fname: str):
-    path = os.path.join("app", "db", fname)
+# The statements the hot paths actually run, with sample parameters and the
+# indexes their plans should use.
+HOT_QUERIES = [
+    (
+        "list_favorites",
+        LIST_FAVORITES_SQL,
+        (1,),
+        ["favorites_pkey", "prices_station_id_recorded_at_idx"],
+    ),
+    ("snapshot_new_stations", NEW_STATIONS_SQL, (0,), ["stations_pkey"]),
+    ("snapshot_new_prices", NEW_PRICES_SQL, (0,), ["prices_pkey"]),
+    ("price_stats_lookup", SELECT_STATS, (["station:1", "area:0:0"],), ["price_stats_pkey"]),
+    (
+        "price_quarantine_matches",
+        MATCHING_QUARANTINED,
+        {
+            "station_id": 1,
+            "price": 3.49,
+            "submitted_by": "ip:127.0.0.1",
+            "hours": 24,
+            "tolerance": 0.02,
+        },
+        ["price_quarantine_station_id_submitted_at_idx"],
+    ),
+]
 
-    with open(path, "r") as f:
-        sql = f.read()
 
+def check_indexes():
+    """
+    EXPLAIN each hot query and confirm the plan uses its indexes. Sequential
+    scans are disabled for the session: on a small or empty table the planner
+    would rightly prefer one, and we only want to know the index applies.
+    """
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute(sql)
-    conn.commit()
-    cur.close()
-    conn.close()
+    failures = 0
+    try:
+        cur.execute("SET enable_seqscan = off")
+        for label, query, params, index_names in HOT_QUERIES:
+            cur.execute("EXPLAIN " + query, params)
+            plan = "\n".join(row[0] for row in cur.fetchall())
+            missing = [name for name in index_names if name not in plan]
+            if not missing:
+                print(f"ok    {label} uses {', '.join(index_names)}")
+            else:
+                failures += 1
+                print(f"FAIL  {label} does not use {', '.join(missing)}:\n{plan}")
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+    return failures == 0
 
 
 if __name__ == "__main__":
-    for script in [
-        "init_tables.sql",
-        # "init_users_table.sql",
-        # "init_stations_table.sql",
-        # "init_prices_table.sql",
-        # "init_favorites_table.sql",
-        # "init_user_traffic_table.sql",
-    ]:
-        try:
-            run_sql_file(script)
-            print(f"Ran {script}")
-        except Exception as e:
-            print(f"Failed {script}:", e)
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    try:
+        if command == "migrate":
+            migrate()
+        elif command == "status":
+            status()
+        elif command == "check":
+            if not check_indexes():
+                sys.exit(1)
+        else:
+            sys.exit(f"Unknown command {command!r}; use migrate, status or check")
+    except Exception as e:
+        print(f"Failed {command}:", e)
+        sys.exit(1)
@@ -0,0 +1,42 @@
+class FakeCursor:
+    """
+    Stands in for a psycopg2 cursor. Each execute() takes the next queued
+    result set, and the statements run are kept in `executed`.
+    """
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.executed = []
+        self.rowcount = -1
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+        self._rows = self.results.pop(0) if self.results else []
+        self.rowcount = len(self._rows)
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, results=()):
+        self.cur = FakeCursor(results)
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,44 @@
+import init_db
+from tests.conftest import FakeCursor
+
+
+def test_migrations_run_in_version_order():
+    versions = [version for version, _ in init_db.list_migrations()]
+
+    assert versions == sorted(versions)
+    assert versions[:3] == ["0001", "0002", "0003"]
+
+
+def test_split_statements_drops_comments():
+    sql = """-- migrate: no-transaction
+-- first index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS a_idx ON a (x);
+
+create unique index concurrently b_idx on b (y);
+"""
+    statements = init_db.split_statements(sql)
+
+    assert statements == [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS a_idx ON a (x)",
+        "create unique index concurrently b_idx on b (y)",
+    ]
+    assert init_db.concurrent_index_names(statements) == ["a_idx", "b_idx"]
+
+
+def test_only_the_migrations_own_invalid_indexes_are_dropped():
+    cur = FakeCursor([[("a_idx",)]])
+
+    init_db.drop_invalid_indexes(cur, ["a_idx", "b_idx"])
+
+    (lookup, params), (drop, _) = cur.executed
+    assert "c.relname = ANY(%s)" in lookup
+    assert params == (["a_idx", "b_idx"],)
+    assert drop == "DROP INDEX CONCURRENTLY IF EXISTS a_idx"
+
+
+def test_migrations_without_concurrent_indexes_drop_nothing():
+    cur = FakeCursor([])
+
+    init_db.drop_invalid_indexes(cur, [])
+
+    assert cur.executed == []
@@ -0,0 +1,46 @@
+import asyncio
+
+from app import metrics
+from app.metrics import RequestTimingMiddleware, statement_label
+
+LATEST_PRICE = """
+    SELECT s.id, (SELECT price FROM prices WHERE station_id = s.id
+                  ORDER BY recorded_at DESC LIMIT 1) AS latest_price
+    FROM stations s {}
+"""
+
+
+def test_statements_with_a_shared_prefix_get_distinct_labels():
+    by_station = statement_label(LATEST_PRICE.format("WHERE s.id = %s"))
+    all_stations = statement_label(LATEST_PRICE.format("ORDER BY s.id"))
+
+    assert by_station != all_stations
+    assert statement_label("SELECT   1\n") == statement_label("SELECT 1")
+
+
+def test_named_statements_use_their_name():
+    assert statement_label("\n  -- name: list_favorites\n  SELECT 1") == "list_favorites"
+
+
+def test_streamed_response_is_timed_until_the_last_chunk(monkeypatch):
+    observed = []
+    monkeypatch.setattr(
+        metrics, "observe_request", lambda *args: observed.append(args)
+    )
+
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"1\n", "more_body": True})
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.body", "body": b"2\n"})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "POST"}
+    asyncio.run(RequestTimingMiddleware(streaming_app)(scope, None, send))
+
+    assert len(observed) == 1
+    method, route, status, seconds = observed[0]
+    assert (method, route, status) == ("POST", "unmatched", 200)
+    assert seconds >= 0.05
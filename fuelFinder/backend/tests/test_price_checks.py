@@ -0,0 +1,141 @@
+import pytest
+
+from app.price_checks import (
+    EWMA_ALPHA,
+    PriceValidator,
+    Stats,
+    area_scope,
+    station_scope,
+)
+from tests.conftest import FakeCursor
+
+STATION = 1
+LAT, LON = 40.75, -73.99
+
+
+def fold(stats, price):
+    # the same update UPSERT_STATS applies in SQL
+    if stats is None:
+        return Stats(1, price, 0.0)
+    delta = price - stats.mean
+    return Stats(
+        stats.n + 1,
+        stats.mean + EWMA_ALPHA * delta,
+        (1 - EWMA_ALPHA) * (stats.variance + EWMA_ALPHA * delta**2),
+    )
+
+
+class FakeValidator(PriceValidator):
+    """
+    Keeps statistics in a dict instead of price_stats, and folds accepted
+    and flagged prices in the way add_price does.
+    """
+
+    def __init__(self, stats=None):
+        super().__init__()
+        self.stats = dict(stats or {})
+
+    def _stats(self, scopes):
+        return [self.stats.get(scope) for scope in scopes]
+
+    def submit(self, price, others=0):
+        cur = FakeCursor([[(others,)]])
+        verdict = self.review(cur, STATION, LAT, LON, price, "ip:203.0.113.7")
+        if verdict.action != "quarantine":
+            for scope in (station_scope(STATION), area_scope(LAT, LON)):
+                self.stats[scope] = fold(self.stats.get(scope), price)
+        return verdict
+
+
+def steady_station(price=3.49, times=20):
+    validator = FakeValidator()
+    for _ in range(times):
+        validator.submit(price)
+    return validator
+
+
+def test_step_change_after_a_stable_run_is_not_quarantined():
+    validator = steady_station()
+
+    verdicts = [validator.submit(3.85) for _ in range(5)]
+
+    assert verdicts[0].action == "flag"
+    assert all(v.action != "quarantine" for v in verdicts)
+    assert verdicts[-1].action == "accept"
+
+
+def test_typo_after_a_stable_run_is_quarantined():
+    validator = steady_station()
+
+    assert validator.submit(34.9).action == "quarantine"
+    assert validator.submit(13.49).action == "quarantine"
+
+
+def test_area_overrules_a_stale_station():
+    validator = FakeValidator(
+        {
+            station_scope(STATION): Stats(20, 3.49, 0.0),
+            area_scope(LAT, LON): Stats(500, 4.20, 0.09),
+        }
+    )
+
+    verdict = validator.check(STATION, LAT, LON, 4.49)
+
+    assert verdict.action == "flag"
+
+
+def test_area_flag_does_not_overrule_a_station_quarantine():
+    validator = FakeValidator(
+        {
+            station_scope(STATION): Stats(20, 3.49, 0.0),
+            area_scope(LAT, LON): Stats(500, 3.80, 0.09),
+        }
+    )
+
+    for price in (4.99, 5.29, 5.49):
+        assert validator.check(STATION, LAT, LON, price).action == "quarantine"
+
+
+def test_held_price_is_accepted_once_others_confirm_it():
+    validator = steady_station()
+
+    assert validator.submit(4.99, others=0).action == "quarantine"
+    assert validator.submit(4.99, others=1).action == "quarantine"
+    assert validator.submit(4.99, others=2).action == "flag"
+
+
+def test_confirmations_exclude_the_submitter():
+    validator = steady_station()
+    cur = FakeCursor([[(0,)]])
+
+    validator.review(cur, STATION, LAT, LON, 4.99, "uid:alice")
+
+    sql, params = cur.executed[0]
+    assert "COUNT(DISTINCT submitted_by)" in sql
+    assert params["submitted_by"] == "uid:alice"
+
+
+def test_out_of_range_prices_never_count_as_confirmed():
+    validator = steady_station()
+    cur = FakeCursor([[(10,)]])
+
+    verdict = validator.review(cur, STATION, LAT, LON, 0.01, "uid:alice")
+
+    assert verdict.action == "quarantine"
+    assert cur.executed == []
+
+
+def test_new_station_uses_area_then_accepts_without_history():
+    validator = FakeValidator({area_scope(LAT, LON): Stats(50, 3.50, 0.01)})
+
+    assert validator.check(STATION, LAT, LON, 3.55).action == "accept"
+    assert validator.check(2, 10.0, 10.0, 9.99) == (
+        "accept",
+        None,
+        "not enough history",
+    )
+
+
+@pytest.mark.parametrize("price", [0.49, 20.01])
+def test_hard_bounds(price):
+    assert FakeValidator().check(STATION, LAT, LON, price).action == "quarantine"
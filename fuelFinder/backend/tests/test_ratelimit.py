@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app import firebase, identity, ratelimit
+from app.identity import caller_key
+from app.ratelimit import Budget, MemoryBucketStore
+
+ANONYMOUS = SimpleNamespace(client=SimpleNamespace(host="203.0.113.7"), headers={})
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(ratelimit, "_store", MemoryBucketStore())
+    monkeypatch.setattr(ratelimit, "_plan_cache", {})
+    # tokens are "uid-<uid>"
+    fake_auth = SimpleNamespace(
+        verify_id_token=lambda token: {"uid": token.removeprefix("uid-")}
+    )
+    monkeypatch.setattr(firebase, "_auth", fake_auth)
+
+
+def test_take_charges_the_cost():
+    store = MemoryBucketStore()
+    budget = Budget(10, 10)
+
+    assert store.take("k", budget, 8) == (True, 0.0)
+    allowed, retry_after = store.take("k", budget, 5)
+    assert not allowed
+    assert retry_after == pytest.approx(18, abs=0.1)  # 3 more tokens at 1 per 6s
+    assert store.take("k", budget, 2)[0]
+
+
+def test_batch_cost_comes_out_of_the_plan_route_bucket(limiter):
+    ratelimit.enforce_rate_limit("plan-route", ANONYMOUS, None, cost=9)
+    ratelimit.enforce_rate_limit("plan-route", ANONYMOUS, None)
+
+    with pytest.raises(HTTPException) as e:
+        ratelimit.enforce_rate_limit("plan-route", ANONYMOUS, None)
+    assert e.value.status_code == 429
+
+
+def test_batch_larger_than_the_plan_allows_is_rejected(limiter):
+    with pytest.raises(HTTPException) as e:
+        ratelimit.enforce_rate_limit("plan-route", ANONYMOUS, None, cost=11)
+    assert e.value.status_code == 413
+
+
+def test_signed_in_callers_get_their_own_bucket_and_plan(limiter):
+    ratelimit.remember_plan("alice", True)
+
+    ratelimit.enforce_rate_limit("plan-route", ANONYMOUS, "Bearer uid-alice", cost=400)
+    # same address, but alice's spending does not touch the anonymous bucket
+    ratelimit.enforce_rate_limit("plan-route", ANONYMOUS, None, cost=10)
+
+
+def test_caller_key_prefers_the_verified_user(limiter):
+    assert caller_key(ANONYMOUS, "Bearer uid-alice") == "uid:alice"
+    assert caller_key(ANONYMOUS, None) == "ip:203.0.113.7"
+    assert caller_key(ANONYMOUS, "Basic xyz") == "ip:203.0.113.7"
+
+
+def test_client_address_counts_trusted_proxies_from_the_right(monkeypatch):
+    # the client claims to be 198.51.100.1; Cloud Run appends the real address
+    request = SimpleNamespace(
+        client=SimpleNamespace(host="169.254.1.1"),
+        headers={"x-forwarded-for": "198.51.100.1, 203.0.113.7"},
+    )
+
+    monkeypatch.setattr(identity, "TRUSTED_PROXY_HOPS", 0)
+    assert identity.client_address(request) == "169.254.1.1"
+    monkeypatch.setattr(identity, "TRUSTED_PROXY_HOPS", 1)
+    assert identity.client_address(request) == "203.0.113.7"
+    monkeypatch.setattr(identity, "TRUSTED_PROXY_HOPS", 3)
+    assert identity.client_address(request) == "169.254.1.1"
+
+
+def test_plan_cache_drops_expired_entries(monkeypatch):
+    monkeypatch.setattr(ratelimit, "PLAN_CACHE_MAX_USERS", 2)
+    monkeypatch.setattr(
+        ratelimit, "_plan_cache", {"old": (True, 0.0), "older": (False, 0.0)}
+    )
+
+    ratelimit.remember_plan("new", False)
+
+    assert set(ratelimit._plan_cache) == {"new"}
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import firebase
+from app.db import connection
+from app.main import app
+from app.routes import stations
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(connection, "_recent_writes", {})
+    verified = []
+
+    def verify_id_token(token):
+        verified.append(token)
+        return {"uid": token}
+
+    monkeypatch.setattr(
+        firebase, "_auth", SimpleNamespace(verify_id_token=verify_id_token)
+    )
+    refreshes = []
+    monkeypatch.setattr(
+        stations.station_snapshot,
+        "refresh",
+        lambda use_primary=False: refreshes.append(use_primary),
+    )
+    monkeypatch.setattr(stations.station_snapshot, "list_stations", lambda: [])
+    client = TestClient(app)
+    client.refreshes = refreshes
+    client.verified = verified
+    return client
+
+
+def test_only_the_writer_reads_from_the_primary(client):
+    connection.mark_write("uid:alice")
+
+    client.get("/stations/", headers={"Authorization": "Bearer bob"})
+    client.get("/stations/")
+    assert client.refreshes == []
+
+    client.get("/stations/", headers={"Authorization": "Bearer alice"})
+    assert client.refreshes == [True]
+
+
+def test_reads_skip_token_checks_when_nothing_was_written(client):
+    client.get("/stations/", headers={"Authorization": "Bearer alice"})
+
+    assert client.verified == []
+    assert client.refreshes == []
+
+
+def test_write_window_travels_with_the_request(monkeypatch):
+    monkeypatch.setattr(connection, "_recent_writes", {})
+    worker = FastAPI()
+    worker.add_middleware(connection.ReadYourWritesMiddleware)
+
+    @worker.post("/write")
+    def write():
+        connection.mark_write("user:1")
+
+    @worker.get("/read")
+    def read():
+        return connection.recently_wrote(None)
+
+    client = TestClient(worker)
+    wrote = client.post("/write")
+    until = wrote.headers[connection.READ_YOUR_WRITES_HEADER]
+    # a different worker has no local record of the write
+    connection._recent_writes.clear()
+
+    assert client.get("/read").json() is False
+    echoed = {connection.READ_YOUR_WRITES_HEADER: until}
+    assert client.get("/read", headers=echoed).json() is True
+    expired = {connection.READ_YOUR_WRITES_HEADER: str(float(until) - 3600)}
+    assert client.get("/read", headers=expired).json() is False
+
+
+def test_failed_refresh_after_a_write_is_not_an_error(monkeypatch):
+    def broken(use_primary=False):
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(stations.station_snapshot, "refresh", broken)
+
+    stations.refresh_after_write()
@@ -0,0 +1,48 @@
+from array import array
+
+from app.db.snapshot import StationColumns
+from app.routes import stations
+from app.schemas import RoutePlanRequest
+
+# Three stations on the way from lower to upper Manhattan and one in New Jersey.
+COLUMNS = StationColumns(
+    ids=array("q", [1, 2, 3, 4]),
+    names=["Cheap", "Pricey", "Unpriced", "Far"],
+    latitudes=array("d", [40.75, 40.76, 40.77, 40.20]),
+    longitudes=array("d", [-73.99, -73.98, -73.97, -74.60]),
+    latest_prices=array("d", [3.19, 3.89, float("nan"), 2.50]),
+)
+
+TRIP = RoutePlanRequest(
+    current_lat=40.71,
+    current_lon=-74.01,
+    destination_lat=40.80,
+    destination_lon=-73.96,
+    max_detour_km=5,
+    num_stations=3,
+)
+
+
+def test_select_stops_skips_unpriced_and_distant_stations():
+    stops = stations.select_stops(COLUMNS, TRIP)
+
+    assert [s["id"] for s in stops] == [1, 2]
+    assert stops[0]["latest_price"] == 3.19
+
+
+def test_large_batches_use_the_shared_process_pool(monkeypatch):
+    monkeypatch.setattr(stations, "BATCH_PROCESS_POOL_THRESHOLD", 0)
+    monkeypatch.setattr(stations, "BATCH_PROCESS_WORKERS", 2)
+    monkeypatch.setattr(stations, "_stops_pool", None)
+    trips = [TRIP] * 5
+
+    try:
+        first = stations._plan_batch_stops(COLUMNS, trips)
+        pool = stations._stops_pool
+        second = stations._plan_batch_stops(COLUMNS, trips)
+
+        assert stations._stops_pool is pool
+        assert first == second == [stations.select_stops(COLUMNS, TRIP)] * 5
+    finally:
+        if stations._stops_pool is not None:
+            stations._stops_pool.shutdown()
@@ -0,0 +1,105 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+from app.db import snapshot
+from app.db.snapshot import CURSOR_OVERLAP, StationSnapshot
+from tests.conftest import FakeConnection
+
+NOW = datetime(2025, 5, 1, tzinfo=timezone.utc)
+
+
+def refresh_with(monkeypatch, snap, stations, prices):
+    monkeypatch.setattr(
+        snapshot, "get_read_connection", lambda: FakeConnection([stations, prices])
+    )
+    snap.refresh()
+
+
+def test_refresh_tracks_latest_price(monkeypatch):
+    snap = StationSnapshot()
+    refresh_with(
+        monkeypatch,
+        snap,
+        [(1, "Shell", 40.7, -73.9), (2, "BP", 40.8, -73.8)],
+        [
+            (1, 1, 3.49, NOW - timedelta(days=1)),
+            (2, 1, 3.59, NOW),
+        ],
+    )
+
+    one = snap._row_dict(snap._rows_by_id[1])
+    assert one["latest_price"] == 3.59
+    assert [p["price"] for p in one["prices"]] == [3.59, 3.49]
+    assert snap._row_dict(snap._rows_by_id[2])["latest_price"] is None
+
+
+def test_incremental_refresh_skips_prices_already_seen(monkeypatch):
+    snap = StationSnapshot()
+    refresh_with(monkeypatch, snap, [(1, "Shell", 40.7, -73.9)], [(1, 1, 3.49, NOW)])
+    # the overlap window hands back price 1 again alongside the new one
+    refresh_with(
+        monkeypatch,
+        snap,
+        [(1, "Shell", 40.7, -73.9)],
+        [(1, 1, 3.49, NOW), (2, 1, 3.55, NOW + timedelta(hours=1))],
+    )
+
+    assert len(snap.history[0]) == 2
+    assert snap.latest_prices[0] == 3.55
+
+
+def test_seen_price_ids_are_trimmed_to_the_overlap_window(monkeypatch):
+    snap = StationSnapshot()
+    prices = [(i, 1, 3.0, NOW + timedelta(minutes=i)) for i in range(1, 501)]
+    refresh_with(monkeypatch, snap, [(1, "Shell", 40.7, -73.9)], prices)
+
+    assert len(snap.history[0]) == 500
+    assert min(snap._seen_price_ids) > 500 - CURSOR_OVERLAP
+    assert len(snap._seen_price_ids) == CURSOR_OVERLAP
+
+
+def test_columns_copy_is_reused_until_something_changes(monkeypatch):
+    snap = StationSnapshot(max_age=3600)
+    refresh_with(monkeypatch, snap, [(1, "Shell", 40.7, -73.9)], [])
+
+    first = snap.columns()
+    assert math.isnan(first.latest_prices[0])
+    assert snap.columns() is first
+
+    refresh_with(monkeypatch, snap, [], [(1, 1, 3.49, NOW)])
+    second = snap.columns()
+    assert second is not first
+    assert second.latest_prices[0] == 3.49
+    assert math.isnan(first.latest_prices[0])
+
+
+def test_refresh_results_applied_out_of_order_add_no_duplicates():
+    snap = StationSnapshot()
+
+    def prices(first, last):
+        return [(i, 1, 3.0, NOW + timedelta(minutes=i)) for i in range(first, last + 1)]
+
+    snap._apply([(1, "Shell", 40.7, -73.9)], prices(1, 1000))
+    # a later read is applied before an earlier, overlapping one
+    snap._apply([], prices(901, 1500))
+    snap._apply([], prices(901, 1200))
+
+    ids = [p["recorded_at"] for p in snap.history[0]]
+    assert len(ids) == len(set(ids)) == 1500
+
+
+def test_unknown_station_ids_refresh_at_most_once_per_interval(monkeypatch):
+    snap = StationSnapshot(max_age=3600)
+    refresh_with(monkeypatch, snap, [(1, "Shell", 40.7, -73.9)], [])
+    calls = []
+    monkeypatch.setattr(snap, "refresh", lambda: calls.append(1))
+
+    assert snap.get_station(1_000_000) is None
+    assert snap.get_station(1) is not None
+    # ids at or below the cursor were already read, so they cannot appear
+    snap._refreshed_at -= 60
+    assert snap.get_station(0) is None
+    assert calls == []
+
+    assert snap.get_station(2) is None
+    assert calls == [1]
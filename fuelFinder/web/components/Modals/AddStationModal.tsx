@@ -1,6 +1,7 @@
 "use client";
 
 import React, { useState } from "react";
+import { authHeaders, rememberWrite, useAuth } from "../../src/app/lib/auth";
 
 export type AddStationModalProps = {
   visible: boolean;
@@ -13,6 +14,7 @@ const AddStationModal: React.FC<AddStationModalProps> = ({
   onSuccess,
   onCancel,
 }) => {
+  const { user } = useAuth();
   const [form, setForm] = useState({
     name: "",
     latitude: "",
@@ -55,11 +57,15 @@ const AddStationModal: React.FC<AddStationModalProps> = ({
         `${process.env.NEXT_PUBLIC_BACKEND_URL}/stations/${newStation.id}/prices`,
         {
           method: "POST",
-          headers: { "Content-Type": "application/json" },
+          headers: {
+            "Content-Type": "application/json",
+            ...(await authHeaders(user)),
+          },
           body: JSON.stringify({ price: parseFloat(form.price) }),
         }
       );
       if (!priceRes.ok) throw new Error("Failed to add price");
+      rememberWrite(priceRes);
 
       // 3) Notify parent and reset
       onSuccess();
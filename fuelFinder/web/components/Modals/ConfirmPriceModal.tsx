@@ -1,6 +1,7 @@
 "use client";
 
 import React, { useState } from "react";
+import { authHeaders, rememberWrite, useAuth } from "../../src/app/lib/auth";
 
 export type ConfirmPriceModalProps = {
   visible: boolean;
@@ -15,6 +16,7 @@ const ConfirmPriceModal: React.FC<ConfirmPriceModalProps> = ({
   onSuccess,
   onClose,
 }) => {
+  const { user } = useAuth();
   const [price, setPrice] = useState("");
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -31,6 +33,7 @@ const ConfirmPriceModal: React.FC<ConfirmPriceModalProps> = ({
           method: "POST",
           headers: {
             "Content-Type": "application/json",
+            ...(await authHeaders(user)),
           },
           body: JSON.stringify({ price: Number(price) }),
         }
@@ -40,6 +43,7 @@ const ConfirmPriceModal: React.FC<ConfirmPriceModalProps> = ({
         const text = await res.text();
         throw new Error(`Error ${res.status}: ${text}`);
       }
+      rememberWrite(res);
 
       const newPriceRecord: { price: number; recorded_at: string } =
         await res.json();
@@ -23,6 +23,32 @@ const AuthContext = createContext<AuthContextType>({
 
 export const useAuth = () => useContext(AuthContext);
 
+// After a write the backend returns this header; echoing it on the next
+// reads makes whichever server instance answers read from the primary
+// database, so the user sees their own change.
+const READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes-Until";
+
+export function rememberWrite(res: Response) {
+  const until = res.headers.get(READ_YOUR_WRITES_HEADER);
+  if (until) sessionStorage.setItem(READ_YOUR_WRITES_HEADER, until);
+}
+
+export function readYourWritesHeaders(): Record<string, string> {
+  const until = sessionStorage.getItem(READ_YOUR_WRITES_HEADER);
+  if (!until || Number(until) * 1000 < Date.now()) return {};
+  return { [READ_YOUR_WRITES_HEADER]: until };
+}
+
+// Authorization header for endpoints that also work signed out. Sending it
+// lets the backend apply the user's plan limits and read-your-writes.
+export async function authHeaders(
+  user: User | null
+): Promise<Record<string, string>> {
+  const headers = readYourWritesHeaders();
+  if (!user) return headers;
+  return { ...headers, Authorization: `Bearer ${await user.getIdToken()}` };
+}
+
 export function AuthProvider({ children }: { children: ReactNode }) {
   const [user, setUser] = useState<User | null>(null);
   const [loading, setLoading] = useState(true);
@@ -14,6 +14,7 @@ import ProtectedRoute from "../../../components/ProtectedRoute";
 import AddStationModal from "../../../components/Modals/AddStationModal";
 import StationInfoWindow from "../../../components/StationInfoWindow";
 import { auth } from "../lib/firebase";
+import { authHeaders, readYourWritesHeaders, rememberWrite } from "../lib/auth";
 import { Station } from "../../../schemas/station";
 import Link from "next/link";
 
@@ -66,7 +67,8 @@ function MapPageContent() {
   const fetchStations = async (): Promise<Station[]> => {
     try {
       const res = await fetch(
-        `${process.env.NEXT_PUBLIC_BACKEND_URL}/stations`
+        `${process.env.NEXT_PUBLIC_BACKEND_URL}/stations`,
+        { headers: await authHeaders(auth.currentUser) }
       );
       const data: Station[] = await res.json();
       setStations(data);
@@ -96,6 +98,7 @@ function MapPageContent() {
           credentials: "include",
           headers: {
             Authorization: `Bearer ${token}`,
+            ...readYourWritesHeaders(),
           },
         }
       );
@@ -200,6 +203,7 @@ function MapPageContent() {
     if (!res.ok) {
       console.error("toggle failed", await res.text());
     }
+    rememberWrite(res);
     // re-fetch your updated list
     await fetchFavorites();
   };
@@ -7,7 +7,7 @@ import {
   DirectionsRenderer,
   useLoadScript,
 } from "@react-google-maps/api";
-import { useAuth } from "../lib/auth";
+import { authHeaders, useAuth } from "../lib/auth";
 import AdBanner from "../../../components/AdBanner";
 
 interface Station {
@@ -112,7 +112,7 @@ export default function TripPlannerPage() {
       `${process.env.NEXT_PUBLIC_BACKEND_URL}/stations/plan-route`,
       {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", ...(await authHeaders(user)) },
         body: JSON.stringify({
           current_lat: curLat,
           current_lon: curLng,
@@ -8,6 +8,7 @@ import {
   Marker,
   useLoadScript,
 } from "@react-google-maps/api";
+import { authHeaders, useAuth } from "../../lib/auth";
 
 interface PriceHistoryItem {
   price: number;
@@ -26,6 +27,7 @@ interface StationDetail {
 
 export default function StationDetailPage() {
   const { station_id } = useParams();
+  const { user } = useAuth();
   const [station, setStation] = useState<StationDetail | null>(null);
   const [loading, setLoading] = useState(true);
   const [feedbackLoading, setFeedbackLoading] = useState(false);
@@ -39,7 +41,8 @@ export default function StationDetailPage() {
     const fetchStation = async () => {
       try {
         const res = await fetch(
-          `${process.env.NEXT_PUBLIC_BACKEND_URL}/stations/${station_id}`
+          `${process.env.NEXT_PUBLIC_BACKEND_URL}/stations/${station_id}`,
+          { headers: await authHeaders(user) }
         );
         const data = await res.json();
         setStation(data);
@@ -51,7 +54,7 @@ export default function StationDetailPage() {
     };
 
     if (station_id) fetchStation();
-  }, [station_id]);
+  }, [station_id, user]);
 
   const fetchFeedback = async () => {
     if (!station) return;
@@ -62,6 +65,7 @@ export default function StationDetailPage() {
         method: "post",
         headers: {
           "Content-Type": "application/json",
+          ...(await authHeaders(user)),
         },
         body: JSON.stringify({
           name: station.name,